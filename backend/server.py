@@ -1,14 +1,17 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, UploadFile, File
-from fastapi.responses import RedirectResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, UploadFile, File, BackgroundTasks
+from fastapi.responses import RedirectResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 import os
 import logging
-import json
+import asyncio
+import orjson
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import httpx
@@ -17,6 +20,12 @@ from bs4 import BeautifulSoup
 from openai import AsyncOpenAI
 import base64
 import re
+import numpy as np
+import ahocorasick
+from bisect import bisect_right
+from cachetools import TTLCache
+from functools import lru_cache
+from urllib.parse import urlparse
 from authlib.integrations.starlette_client import OAuth
 
 ROOT_DIR = Path(__file__).parent
@@ -42,6 +51,7 @@ try:
         socketTimeoutMS=45000,               # Socket timeout for operations
         maxPoolSize=100,                     # Maximum connections in pool
         minPoolSize=10,                      # Minimum connections to maintain
+        waitQueueTimeoutMS=2500,             # Fail fast rather than queue forever when the pool is exhausted
         maxIdleTimeMS=30000,                 # Close idle connections after 30s
         retryWrites=True,                    # Automatically retry write operations
         retryReads=True,                     # Automatically retry read operations
@@ -70,7 +80,7 @@ APP_URL = os.environ.get('APP_URL', 'http://localhost:3000')
 SECRET_KEY = os.environ.get('SECRET_KEY', 'your-secret-key-change-in-production')
 
 # Create the main app
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Add session middleware for OAuth
 from starlette.middleware.sessions import SessionMiddleware
@@ -88,7 +98,7 @@ if GOOGLE_CLIENT_ID and GOOGLE_CLIENT_SECRET:
     )
 
 # Create a router with the /api prefix
-api_router = APIRouter(prefix="/api")
+api_router = APIRouter(prefix="/api", default_response_class=ORJSONResponse)
 
 # Health check endpoint (outside /api for DigitalOcean)
 @app.get("/health")
@@ -144,6 +154,11 @@ class Recipe(BaseModel):
     review_count: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# Validates and serialises whole recipe lists inside pydantic-core
+RECIPE_LIST_ADAPTER = TypeAdapter(List[Recipe])
+# Only the fields a Recipe response carries
+RECIPE_PROJECTION = {"_id": 0, **{field: 1 for field in Recipe.model_fields}}
+
 class Review(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -229,6 +244,7 @@ class PantryItem(BaseModel):
     typical_purchase: float = 0  # Suggested buy amount
     last_updated: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     expiry_date: Optional[str] = None
+    expiry_epoch_days: Optional[int] = None  # Derived from expiry_date for indexed expiry scans
 
 class Pantry(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -255,6 +271,9 @@ class PantryItemUpdate(BaseModel):
     expiry_date: Optional[str] = None
     clear_expiry_date: Optional[bool] = None  # Set to True to remove expiry date
 
+class BulkDeleteRequest(BaseModel):
+    ids: List[str]
+
 class CookRecipeRequest(BaseModel):
     recipe_id: str
     servings_multiplier: float = 1.0
@@ -324,11 +343,13 @@ class DomainQuota(BaseModel):
 
 # ============== N-GRAM COMPLIANCE CHECKER ==============
 
+_PUNCTUATION_RE = re.compile(r'[^\w\s]')
+
 def get_ngrams(text: str, n: int = 8) -> set:
     """Extract n-grams from text for overlap checking"""
     # Normalize text
     text = text.lower().strip()
-    text = re.sub(r'[^\w\s]', '', text)  # Remove punctuation
+    text = _PUNCTUATION_RE.sub('', text)  # Remove punctuation
     words = text.split()
     
     if len(words) < n:
@@ -381,6 +402,9 @@ def check_overall_ngram_overlap(source_text: str, rewritten_text: str) -> float:
 
 # ============== STEP GRAPH FOR REWRITING ==============
 
+_STEP_TIME_RE = re.compile(r'(\d+)\s*(min|minute|hour|hr|mins|minutes|hours|hrs)', re.IGNORECASE)
+_STEP_TEMP_RE = re.compile(r'(\d+)\s*°?\s*(C|F|celsius|fahrenheit)', re.IGNORECASE)
+
 def parse_to_step_graph(instructions: List[str], ingredients: List[dict]) -> dict:
     """Parse instructions into a step graph for rewriting
     Extracts: actions, temperatures, times, ingredient dependencies
@@ -392,9 +416,6 @@ def parse_to_step_graph(instructions: List[str], ingredients: List[dict]) -> dic
         "max_temp": None
     }
     
-    time_pattern = re.compile(r'(\d+)\s*(min|minute|hour|hr|mins|minutes|hours|hrs)', re.IGNORECASE)
-    temp_pattern = re.compile(r'(\d+)\s*°?\s*(C|F|celsius|fahrenheit)', re.IGNORECASE)
-    
     ingredient_names = [ing.get('name', '').lower() for ing in ingredients]
     
     for i, instruction in enumerate(instructions):
@@ -409,7 +430,7 @@ def parse_to_step_graph(instructions: List[str], ingredients: List[dict]) -> dic
         }
         
         # Extract time
-        time_match = time_pattern.search(instruction)
+        time_match = _STEP_TIME_RE.search(instruction)
         if time_match:
             value = int(time_match.group(1))
             unit = time_match.group(2).lower()
@@ -419,7 +440,7 @@ def parse_to_step_graph(instructions: List[str], ingredients: List[dict]) -> dic
             step_graph["total_time_min"] += value
         
         # Extract temperature
-        temp_match = temp_pattern.search(instruction)
+        temp_match = _STEP_TEMP_RE.search(instruction)
         if temp_match:
             temp_value = int(temp_match.group(1))
             temp_unit = temp_match.group(2).upper()[0]
@@ -461,6 +482,10 @@ def parse_to_step_graph(instructions: List[str], ingredients: List[dict]) -> dic
 
 # ============== AI REWRITE SYSTEM ==============
 
+# Bump when REWRITE_SYSTEM_PROMPT changes so cached rewrites are regenerated
+PROMPT_VERSION = "v1"
+REWRITE_CACHE_TTL_DAYS = 90
+
 REWRITE_SYSTEM_PROMPT = """You are a culinary editor. Create ORIGINAL instructions from the provided step graph and ingredient facts.
 
 STRICTLY PROHIBITED:
@@ -549,15 +574,14 @@ Write 6-12 original imperative steps. Reorder prep steps for efficiency. Use dif
             if len(parts) >= 2:
                 clean_response = parts[1]
         
-        import json
         try:
-            rewrite_data = json.loads(clean_response.strip())
-        except json.JSONDecodeError:
+            rewrite_data = orjson.loads(clean_response.strip())
+        except orjson.JSONDecodeError:
             # Try to find JSON object
             start = clean_response.find("{")
             end = clean_response.rfind("}") + 1
             if start >= 0 and end > start:
-                rewrite_data = json.loads(clean_response[start:end])
+                rewrite_data = orjson.loads(clean_response[start:end])
             else:
                 raise ValueError("Could not parse AI response")
         
@@ -571,6 +595,32 @@ Write 6-12 original imperative steps. Reorder prep steps for efficiency. Use dif
         logger.error(f"AI rewrite failed: {e}")
         raise HTTPException(status_code=500, detail=f"AI rewrite failed: {str(e)}")
 
+# In-flight rewrites keyed by source_hash so concurrent shares of the same recipe
+# wait on a single OpenAI call
+_inflight_rewrites: Dict[str, asyncio.Future] = {}
+
+async def rewrite_instructions_single_flight(source_hash: str, **kwargs) -> dict:
+    """rewrite_instructions_with_ai, deduplicated across concurrent callers"""
+    fut = _inflight_rewrites.get(source_hash)
+    if fut:
+        # Shield so a disconnecting waiter doesn't cancel the shared call
+        return await asyncio.shield(fut)
+    
+    fut = asyncio.get_running_loop().create_future()
+    _inflight_rewrites[source_hash] = fut
+    try:
+        result = await rewrite_instructions_with_ai(**kwargs)
+        fut.set_result(result)
+        return result
+    except Exception as e:
+        fut.set_exception(e)
+        fut.exception()  # Mark retrieved in case nobody else was waiting
+        raise
+    finally:
+        if not fut.done():
+            fut.cancel()
+        _inflight_rewrites.pop(source_hash, None)
+
 # ============== COMPLIANCE VALIDATION ==============
 
 async def validate_compliance(
@@ -619,77 +669,78 @@ async def validate_compliance(
 
 # ============== DOMAIN QUOTA MANAGEMENT ==============
 
-async def check_domain_quota(domain: str) -> bool:
-    """Check if domain quota allows import
-    Enforces per-domain limits to respect database rights
+# Per-domain limits (configurable - these are conservative defaults)
+MAX_DAILY_PER_DOMAIN = 10  # Max imports per domain per day
+MAX_90DAY_PER_DOMAIN = 100  # Max imports per domain per 90 days
+
+async def claim_domain_quota(domain: str) -> bool:
+    """Atomically reserve one import slot for a domain
+    Enforces per-domain limits to respect database rights. Check and increment
+    happen in a single conditional update so concurrent shares can't overshoot.
+    Returns False if the domain is over quota.
     """
     if not domain:
         return True
     
-    # Get or create domain quota record
-    quota = await db.domain_quotas.find_one({"domain": domain}, {"_id": 0})
-    
     now = datetime.now(timezone.utc)
     
-    if not quota:
-        quota = {
-            "domain": domain,
+    # Make sure a quota record exists
+    await db.domain_quotas.update_one(
+        {"domain": domain},
+        {"$setOnInsert": {
             "import_count_90d": 0,
-            "last_import": now.isoformat(),
             "daily_imports": 0,
-            "daily_reset": now.isoformat()
-        }
-    
-    # Reset daily counter if needed
-    daily_reset = quota.get("daily_reset")
-    if isinstance(daily_reset, str):
-        daily_reset = datetime.fromisoformat(daily_reset)
-    if daily_reset.tzinfo is None:
-        daily_reset = daily_reset.replace(tzinfo=timezone.utc)
-    
-    if (now - daily_reset).days >= 1:
-        quota["daily_imports"] = 0
-        quota["daily_reset"] = now.isoformat()
-    
-    # Check limits (configurable - these are conservative defaults)
-    MAX_DAILY_PER_DOMAIN = 10  # Max imports per domain per day
-    MAX_90DAY_PER_DOMAIN = 100  # Max imports per domain per 90 days
+            "daily_reset": now.isoformat(),
+            "last_import": now.isoformat()
+        }},
+        upsert=True
+    )
     
-    if quota["daily_imports"] >= MAX_DAILY_PER_DOMAIN:
-        return False
+    # Reset daily counter if the current window is more than a day old
+    await db.domain_quotas.update_one(
+        {"domain": domain, "daily_reset": {"$lt": (now - timedelta(days=1)).isoformat()}},
+        {"$set": {"daily_imports": 0, "daily_reset": now.isoformat()}}
+    )
     
-    if quota["import_count_90d"] >= MAX_90DAY_PER_DOMAIN:
-        return False
+    # Claim a slot only if both limits still have room
+    quota = await db.domain_quotas.find_one_and_update(
+        {
+            "domain": domain,
+            "daily_imports": {"$lt": MAX_DAILY_PER_DOMAIN},
+            "import_count_90d": {"$lt": MAX_90DAY_PER_DOMAIN}
+        },
+        {
+            "$inc": {"import_count_90d": 1, "daily_imports": 1},
+            "$set": {"last_import": now.isoformat()}
+        },
+        projection={"_id": 0}
+    )
     
-    return True
+    return quota is not None
 
-async def increment_domain_quota(domain: str):
-    """Increment domain quota counters after successful import"""
+async def release_domain_quota(domain: str):
+    """Give back a slot reserved by claim_domain_quota when the import didn't happen"""
     if not domain:
         return
     
-    now = datetime.now(timezone.utc)
-    
     await db.domain_quotas.update_one(
         {"domain": domain},
-        {
-            "$inc": {"import_count_90d": 1, "daily_imports": 1},
-            "$set": {"last_import": now.isoformat()}
-        },
-        upsert=True
+        {"$inc": {"import_count_90d": -1, "daily_imports": -1}}
     )
 
+@lru_cache(maxsize=4096)
 def extract_domain(url: str) -> str:
     """Extract domain from URL for quota tracking"""
     if not url:
         return ""
     try:
-        from urllib.parse import urlparse
         parsed = urlparse(url)
         return parsed.netloc.lower().replace("www.", "")
     except:
         return ""
 
+_DIGITS_RE = re.compile(r"(\d+)")
+
 # ============== SECURE TOKEN GENERATION ==============
 
 def generate_import_token() -> str:
@@ -700,6 +751,10 @@ def hash_source_content(content: str) -> str:
     """Create SHA-256 hash of source content for audit"""
     return hashlib.sha256(content.encode('utf-8')).hexdigest()
 
+def hash_rewrite(method_rewritten: List[str]) -> bytes:
+    """Cheap digest of rewritten steps for spotting identical AI regenerations"""
+    return hashlib.blake2b("\n".join(method_rewritten).encode('utf-8'), digest_size=16).digest()
+
 # ============== AUTH HELPER FUNCTIONS ==============
 
 async def get_current_user(request: Request) -> Optional[User]:
@@ -755,6 +810,48 @@ async def get_user_id_or_none(request: Request) -> Optional[str]:
 
 # ============== HELPER FUNCTIONS ==============
 
+_EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+def expiry_epoch_days(expiry_str: Optional[str]) -> Optional[int]:
+    """Convert a pantry expiry date (YYYY-MM-DD or ISO datetime) to days since the Unix epoch"""
+    if not expiry_str:
+        return None
+    try:
+        if 'T' in expiry_str:
+            expiry = datetime.fromisoformat(expiry_str.replace('Z', '+00:00')).date()
+        else:
+            expiry = datetime.strptime(expiry_str, '%Y-%m-%d').date()
+    except ValueError:
+        return None
+    return expiry.toordinal() - _EPOCH_ORDINAL
+
+def normalize_pantry_expiry(items: List[dict]) -> List[dict]:
+    """Keep expiry_epoch_days in sync with expiry_date before a pantry write"""
+    for item in items:
+        item['expiry_epoch_days'] = expiry_epoch_days(item.get('expiry_date'))
+    return items
+
+# Greedy, so it spans the first "{" to the last "}" of the response
+_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+def extract_json_object(text: str) -> Optional[dict]:
+    """Parse the JSON object out of an AI response, tolerating code fences and surrounding prose"""
+    if "```json" in text:
+        text = text.split("```json")[1].split("```")[0]
+    elif "```" in text:
+        text = text.split("```")[1].split("```")[0]
+    try:
+        return orjson.loads(text.strip())
+    except orjson.JSONDecodeError:
+        pass
+    match = _JSON_OBJECT_RE.search(text)
+    if not match:
+        return None
+    try:
+        return orjson.loads(match.group())
+    except orjson.JSONDecodeError:
+        return None
+
 def estimate_cooking_times(ingredients: List[dict], recipe_name: str = "") -> tuple[str, str]:
     """Estimate prep and cook time based on ingredients and recipe name"""
     ingredient_count = len(ingredients)
@@ -798,6 +895,10 @@ def estimate_cooking_times(ingredients: List[dict], recipe_name: str = "") -> tu
     
     return prep_time, cook_time
 
+# Time mentions in a step, e.g. "15 minutes", "1 hour", "30 mins"
+_HOURS_RE = re.compile(r'(\d+)\s*(?:hour|hr)s?')
+_MINUTES_RE = re.compile(r'(\d+)\s*(?:minute|min)s?')
+
 def estimate_cooking_times_from_instructions(instructions: List[str], recipe_name: str = "") -> tuple[str, str]:
     """Estimate prep and cook time based on cooking instructions"""
     if not instructions:
@@ -808,15 +909,6 @@ def estimate_cooking_times_from_instructions(instructions: List[str], recipe_nam
     prep_minutes = 0
     cook_minutes = 0
     
-    # Look for explicit time mentions in instructions
-    import re
-    
-    # Find all time mentions (e.g., "15 minutes", "1 hour", "30 mins")
-    time_patterns = [
-        r'(\d+)\s*(?:hour|hr)s?',  # hours
-        r'(\d+)\s*(?:minute|min)s?',  # minutes
-    ]
-    
     # Prep keywords
     prep_keywords = ['chop', 'dice', 'slice', 'mince', 'peel', 'cut', 'prepare', 'mix', 'combine', 'whisk', 'beat', 'marinate']
     # Cook keywords
@@ -834,14 +926,14 @@ def estimate_cooking_times_from_instructions(instructions: List[str], recipe_nam
             cook_steps += 1
         
         # Extract times from this step
-        for match in re.finditer(r'(\d+)\s*(?:hour|hr)s?', step_lower):
+        for match in _HOURS_RE.finditer(step_lower):
             hours = int(match.group(1))
             if any(kw in step_lower for kw in cook_keywords):
                 cook_minutes += hours * 60
             else:
                 prep_minutes += hours * 60
         
-        for match in re.finditer(r'(\d+)\s*(?:minute|min)s?', step_lower):
+        for match in _MINUTES_RE.finditer(step_lower):
             mins = int(match.group(1))
             if any(kw in step_lower for kw in cook_keywords):
                 cook_minutes += mins
@@ -863,22 +955,34 @@ def estimate_cooking_times_from_instructions(instructions: List[str], recipe_nam
     
     return prep_time, cook_time
 
+# Common units to recognize
+_UNITS_PATTERN = r'(?:cups?|tbsps?|tablespoons?|tsps?|teaspoons?|oz|ounces?|lbs?|pounds?|g|grams?|kg|ml|l|liters?|litres?|pieces?|cloves?|cans?|jars?|bunche?s?|handfuls?|pinche?s?|slices?|sticks?|sprigs?|heads?|large|medium|small)'
+# "2 cups flour" or "1/2 cup sugar"
+_QTY_UNIT_NAME_RE = re.compile(
+    rf'^(\d+(?:[.,/]\d+)?(?:\s*-\s*\d+(?:[.,/]\d+)?)?)\s*({_UNITS_PATTERN})\.?\s+(.+)$', re.IGNORECASE
+)
+# "2 onions" or "3 eggs"
+_QTY_NAME_RE = re.compile(r'^(\d+(?:[.,/]\d+)?)\s+(.+)$')
+# "1lb beef" or "500g chicken"
+_QTY_ATTACHED_UNIT_RE = re.compile(rf'^(\d+(?:[.,]\d+)?)\s*({_UNITS_PATTERN})\.?\s+(.+)$', re.IGNORECASE)
+_TRAILING_NOTES_RE = re.compile(r'\s*\([^)]*\)\s*$')
+_PREP_SUFFIX_RE = re.compile(
+    r',?\s*(diced|chopped|minced|sliced|crushed|finely|roughly|to taste|optional|divided|plus more).*$', re.IGNORECASE
+)
+_INSTRUCTION_WORDS = ('step', 'preheat', 'cook', 'stir', 'mix', 'heat', 'serve', 'bake', 'pour', 'place', 'remove', 'let', 'set aside', 'meanwhile')
+
 def parse_ingredients_simple(raw_text: str) -> List[Ingredient]:
     """Simple regex-based ingredient parser - fallback when AI is unavailable"""
     ingredients = []
     lines = raw_text.strip().split('\n')
     
-    # Common units to recognize
-    units_pattern = r'(?:cups?|tbsps?|tablespoons?|tsps?|teaspoons?|oz|ounces?|lbs?|pounds?|g|grams?|kg|ml|l|liters?|litres?|pieces?|cloves?|cans?|jars?|bunche?s?|handfuls?|pinche?s?|slices?|sticks?|sprigs?|heads?|large|medium|small)'
-    
     for line in lines:
         line = line.strip()
         if not line or len(line) < 2:
             continue
         
         # Skip obvious instruction lines
-        instruction_words = ['step', 'preheat', 'cook', 'stir', 'mix', 'heat', 'serve', 'bake', 'pour', 'place', 'remove', 'let', 'set aside', 'meanwhile']
-        if any(line.lower().startswith(word) for word in instruction_words):
+        if line.lower().startswith(_INSTRUCTION_WORDS):
             continue
         
         qty = ''
@@ -886,10 +990,7 @@ def parse_ingredients_simple(raw_text: str) -> List[Ingredient]:
         name = line
         
         # Pattern 1: "2 cups flour" or "1/2 cup sugar"
-        match = re.match(
-            rf'^(\d+(?:[.,/]\d+)?(?:\s*-\s*\d+(?:[.,/]\d+)?)?)\s*({units_pattern})\.?\s+(.+)$',
-            line, re.IGNORECASE
-        )
+        match = _QTY_UNIT_NAME_RE.match(line)
         
         if match:
             qty = match.group(1).replace(',', '.')
@@ -897,21 +998,21 @@ def parse_ingredients_simple(raw_text: str) -> List[Ingredient]:
             name = match.group(3).strip()
         else:
             # Pattern 2: "2 onions" or "3 eggs" (number + item, no unit)
-            match2 = re.match(r'^(\d+(?:[.,/]\d+)?)\s+(.+)$', line)
+            match2 = _QTY_NAME_RE.match(line)
             if match2:
                 qty = match2.group(1).replace(',', '.')
                 name = match2.group(2).strip()
             else:
                 # Pattern 3: "1lb beef" or "500g chicken" (unit attached to number)
-                match3 = re.match(rf'^(\d+(?:[.,]\d+)?)\s*({units_pattern})\.?\s+(.+)$', line, re.IGNORECASE)
+                match3 = _QTY_ATTACHED_UNIT_RE.match(line)
                 if match3:
                     qty = match3.group(1).replace(',', '.')
                     unit = match3.group(2).lower().rstrip('.')
                     name = match3.group(3).strip()
         
         # Clean up name - remove trailing prep instructions and parenthetical notes
-        name = re.sub(r'\s*\([^)]*\)\s*$', '', name)  # Remove trailing (notes)
-        name = re.sub(r',?\s*(diced|chopped|minced|sliced|crushed|finely|roughly|to taste|optional|divided|plus more).*$', '', name, flags=re.IGNORECASE)
+        name = _TRAILING_NOTES_RE.sub('', name)  # Remove trailing (notes)
+        name = _PREP_SUFFIX_RE.sub('', name)
         name = name.strip(' ,')
         
         if name and len(name) > 1:
@@ -1015,7 +1116,7 @@ Return ONLY a valid JSON array, no markdown or explanation."""
                     clean_response = clean_response[4:]
             clean_response = clean_response.strip()
             
-            ingredients_data = json.loads(clean_response)
+            ingredients_data = orjson.loads(clean_response)
             return [Ingredient(**ing) for ing in ingredients_data]
         except Exception as e:
             logger.error(f"Error parsing ingredients with AI: {e}")
@@ -1204,7 +1305,6 @@ Rules:
         logger.info(f"Vision API response: {result[:1000] if result else 'Empty'}")
         
         # Parse response
-        import json
         clean_response = result.strip()
         
         # Remove markdown code blocks if present
@@ -1219,13 +1319,13 @@ Rules:
         
         # Try to parse JSON
         try:
-            data = json.loads(clean_response)
-        except json.JSONDecodeError:
+            data = orjson.loads(clean_response)
+        except orjson.JSONDecodeError:
             # Try to find JSON object in response
             start = clean_response.find("{")
             end = clean_response.rfind("}") + 1
             if start >= 0 and end > start:
-                data = json.loads(clean_response[start:end])
+                data = orjson.loads(clean_response[start:end])
             else:
                 logger.error(f"Could not parse JSON from response: {clean_response}")
                 # Try a simpler fallback extraction
@@ -1412,7 +1512,6 @@ RULES:
         logger.info(f"Instructions Vision API response length: {len(result) if result else 0}")
         logger.info(f"Instructions Vision API response: {result[:1000] if result else 'Empty'}")
         
-        import json
         clean_response = result.strip()
         
         if "```json" in clean_response:
@@ -1425,12 +1524,12 @@ RULES:
         clean_response = clean_response.strip()
         
         try:
-            data = json.loads(clean_response)
-        except json.JSONDecodeError:
+            data = orjson.loads(clean_response)
+        except orjson.JSONDecodeError:
             start = clean_response.find("{")
             end = clean_response.rfind("}") + 1
             if start >= 0 and end > start:
-                data = json.loads(clean_response[start:end])
+                data = orjson.loads(clean_response[start:end])
             else:
                 logger.error(f"Could not parse JSON from instructions response: {clean_response}")
                 return "", [], "", "", ""
@@ -2105,7 +2204,6 @@ async def consolidate_ingredients_with_ai(items: List[ShoppingListItem]) -> List
         
         result = response.choices[0].message.content
         
-        import json
         clean_response = result.strip()
         if clean_response.startswith("```"):
             clean_response = clean_response.split("```")[1]
@@ -2113,7 +2211,7 @@ async def consolidate_ingredients_with_ai(items: List[ShoppingListItem]) -> List
                 clean_response = clean_response[4:]
         clean_response = clean_response.strip()
         
-        consolidated_data = json.loads(clean_response)
+        consolidated_data = orjson.loads(clean_response)
         ai_consolidated = [ShoppingListItem(**item) for item in consolidated_data]
         logger.info(f"AI consolidation: {len(items)} -> {len(ai_consolidated)} items")
         return ai_consolidated
@@ -2159,7 +2257,7 @@ async def scrape_recipe_from_url(url: str) -> dict:
             json_ld_scripts = soup.find_all('script', type='application/ld+json')
             for script in json_ld_scripts:
                 try:
-                    data = json.loads(script.string)
+                    data = orjson.loads(script.string)
                     # Handle @graph array
                     if isinstance(data, dict) and '@graph' in data:
                         data = data['@graph']
@@ -2200,7 +2298,7 @@ async def scrape_recipe_from_url(url: str) -> dict:
                         
                         logger.info(f"Found recipe data from JSON-LD: {recipe_data['name']}")
                         break
-                except (json.JSONDecodeError, TypeError) as e:
+                except (orjson.JSONDecodeError, TypeError) as e:
                     continue
             
             # Fallback to HTML scraping if JSON-LD didn't work
@@ -2380,7 +2478,7 @@ async def extract_recipe_from_soup(soup: BeautifulSoup, url: str) -> dict:
         try:
             if not script.string:
                 continue
-            data = json.loads(script.string)
+            data = orjson.loads(script.string)
             if isinstance(data, dict) and '@graph' in data:
                 data = data['@graph']
             if isinstance(data, list):
@@ -2408,7 +2506,7 @@ async def extract_recipe_from_soup(soup: BeautifulSoup, url: str) -> dict:
                 
                 logger.info(f"Fallback: Found recipe from JSON-LD: {recipe_data['name']}")
                 return recipe_data
-        except (json.JSONDecodeError, TypeError):
+        except (orjson.JSONDecodeError, TypeError):
             continue
     
     # Fallback to HTML parsing
@@ -2484,7 +2582,7 @@ If you cannot find a recipe, return {"name": "", "ingredients": [], "instruction
             if len(parts) >= 2:
                 clean_response = parts[1]
         
-        data = json.loads(clean_response.strip())
+        data = orjson.loads(clean_response.strip())
         return {
             'name': data.get('name', ''),
             'description': '',
@@ -2796,7 +2894,6 @@ REQUIREMENTS:
         result = response.choices[0].message.content.strip()
         
         # Parse JSON array
-        import json
         if "```json" in result:
             result = result.split("```json")[1].split("```")[0]
         elif "```" in result:
@@ -2806,16 +2903,16 @@ REQUIREMENTS:
         
         # Try to parse
         try:
-            rewritten = json.loads(result)
+            rewritten = orjson.loads(result)
             if isinstance(rewritten, list) and len(rewritten) > 0:
                 logger.info(f"Restructured {len(original_instructions)} steps into {len(rewritten)} steps")
                 return rewritten
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             # Try to find array in response
             start = result.find("[")
             end = result.rfind("]") + 1
             if start >= 0 and end > start:
-                rewritten = json.loads(result[start:end])
+                rewritten = orjson.loads(result[start:end])
                 if isinstance(rewritten, list):
                     logger.info(f"Restructured {len(original_instructions)} steps into {len(rewritten)} steps")
                     return rewritten
@@ -3294,6 +3391,16 @@ async def import_recipe(import_data: RecipeImport, request: Request):
 
 # ============== COCKTAILS ENDPOINTS ==============
 
+def recipe_list_response(recipes: List[dict]) -> Response:
+    """JSON response for a list of recipe documents
+    Equivalent to response_model=List[Recipe], but validation and encoding happen in one
+    pydantic-core pass instead of FastAPI's per-field jsonable_encoder walk.
+    """
+    return Response(
+        content=RECIPE_LIST_ADAPTER.dump_json(RECIPE_LIST_ADAPTER.validate_python(recipes)),
+        media_type="application/json"
+    )
+
 @api_router.get("/cocktails", response_model=List[Recipe])
 async def get_cocktails(request: Request, alcoholic: Optional[str] = None):
     """Get all cocktail recipes with optional alcoholic/non-alcoholic filter"""
@@ -3311,14 +3418,11 @@ async def get_cocktails(request: Request, alcoholic: Optional[str] = None):
         query["is_alcoholic"] = False
     # If not specified, return all cocktails
     
-    cursor = db.recipes.find(query, {"_id": 0}).sort("created_at", -1)
+    cursor = db.recipes.find(query, RECIPE_PROJECTION).sort("created_at", -1)
     cocktails = await cursor.to_list(1000)
     
-    for cocktail in cocktails:
-        if isinstance(cocktail.get('created_at'), str):
-            cocktail['created_at'] = datetime.fromisoformat(cocktail['created_at'])
-    
-    return cocktails
+    # ISO created_at strings are parsed during validation
+    return recipe_list_response(cocktails)
 
 @api_router.get("/recipes", response_model=List[Recipe])
 async def get_recipes(request: Request, sort_by: Optional[str] = None):
@@ -3339,10 +3443,8 @@ async def get_recipes(request: Request, sort_by: Optional[str] = None):
     
     recipes = await cursor.to_list(1000)
     
-    for recipe in recipes:
-        if isinstance(recipe.get('created_at'), str):
-            recipe['created_at'] = datetime.fromisoformat(recipe['created_at'])
-    return recipes
+    # ISO created_at strings are parsed during validation
+    return recipe_list_response(recipes)
 
 @api_router.get("/recipes/{recipe_id}", response_model=Recipe)
 async def get_recipe(recipe_id: str):
@@ -3488,10 +3590,37 @@ async def delete_recipe(recipe_id: str, request: Request):
     result = await db.recipes.delete_one(query)
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Recipe not found")
+    await db.reviews.delete_many({"recipe_id": recipe_id})
     return {"message": "Recipe deleted successfully"}
 
+@api_router.post("/recipes/bulk-delete")
+async def bulk_delete_recipes(data: BulkDeleteRequest, request: Request):
+    """Delete several recipes in one request"""
+    user_id = await get_user_id_or_none(request)
+    
+    # If logged in, only delete user's recipes
+    query = {"id": {"$in": data.ids}}
+    if user_id:
+        query["user_id"] = user_id
+    
+    # Resolve the ids this user may delete first, so only their recipes' reviews go with them
+    deleted_ids = await db.recipes.distinct("id", query)
+    if not deleted_ids:
+        return {"message": "Deleted 0 recipes", "deleted": 0}
+    
+    result = await db.recipes.delete_many({"id": {"$in": deleted_ids}})
+    await db.reviews.delete_many({"recipe_id": {"$in": deleted_ids}})
+    return {"message": f"Deleted {result.deleted_count} recipes", "deleted": result.deleted_count}
+
 # ---- Shopping List Routes ----
 
+# Short-lived per-user shopping list items so repeated cost estimates skip the refetch.
+# Every shopping list write calls invalidate_shopping_list_cache.
+_SHOPPING_LIST_CACHE = TTLCache(maxsize=2048, ttl=5)
+
+def invalidate_shopping_list_cache(user_id: Optional[str]):
+    _SHOPPING_LIST_CACHE.pop(user_id, None)
+
 @api_router.post("/shopping-list/generate", response_model=ShoppingList)
 async def generate_shopping_list(data: ShoppingListGenerate, request: Request):
     """Generate a smart shopping list from selected recipes, subtracting pantry inventory"""
@@ -3518,7 +3647,10 @@ async def generate_shopping_list(data: ShoppingListGenerate, request: Request):
     
     # Get pantry inventory to subtract from shopping list
     pantry_query = {"user_id": user_id} if user_id else {"user_id": None}
-    pantry = await db.pantry.find_one(pantry_query, {"_id": 0})
+    pantry = await db.pantry.find_one(
+        pantry_query,
+        {"_id": 0, "items.name": 1, "items.quantity": 1, "items.unit": 1}
+    )
     pantry_items = pantry.get('items', []) if pantry else []
     
     # Build a lookup of pantry items by normalized name
@@ -3572,6 +3704,7 @@ async def generate_shopping_list(data: ShoppingListGenerate, request: Request):
     delete_query = {"user_id": user_id} if user_id else {"user_id": None}
     await db.shopping_lists.delete_many(delete_query)
     await db.shopping_lists.insert_one(doc)
+    invalidate_shopping_list_cache(user_id)
     
     return shopping_list
 
@@ -3605,6 +3738,7 @@ async def update_shopping_list(data: ShoppingListUpdate, request: Request):
     shopping_list['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.shopping_lists.update_one(query, {"$set": shopping_list})
+    invalidate_shopping_list_cache(user_id)
     
     if isinstance(shopping_list.get('created_at'), str):
         shopping_list['created_at'] = datetime.fromisoformat(shopping_list['created_at'])
@@ -3631,6 +3765,7 @@ async def add_custom_item(item: ShoppingListItem, request: Request):
     shopping_list['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.shopping_lists.update_one(query, {"$set": shopping_list})
+    invalidate_shopping_list_cache(user_id)
     
     if isinstance(shopping_list.get('created_at'), str):
         shopping_list['created_at'] = datetime.fromisoformat(shopping_list['created_at'])
@@ -3648,39 +3783,40 @@ async def add_items_to_shopping_list(data: AddItemsToShoppingListRequest, reques
     user_id = await get_user_id_or_none(request)
     
     query = {"user_id": user_id} if user_id else {"user_id": None}
-    shopping_list = await db.shopping_lists.find_one(query, {"_id": 0})
-    
-    if not shopping_list:
-        shopping_list = ShoppingList(items=[], user_id=user_id).model_dump()
-        shopping_list['created_at'] = shopping_list['created_at'].isoformat() if hasattr(shopping_list['created_at'], 'isoformat') else shopping_list['created_at']
-        shopping_list['updated_at'] = shopping_list['updated_at'].isoformat() if hasattr(shopping_list['updated_at'], 'isoformat') else shopping_list['updated_at']
-        await db.shopping_lists.insert_one(shopping_list)
+    shopping_list = await db.shopping_lists.find_one(query, {"_id": 0, "items.name": 1})
     
-    # Add each item to the shopping list
-    added_count = 0
+    # Skip items already on the list (by name, case-insensitive) or repeated in this batch
+    seen_names = {normalize_ingredient_name(i.get('name', '')) for i in (shopping_list or {}).get('items', [])}
+    new_items = []
     for item_data in data.items:
-        # Check if item already exists (by name, case-insensitive)
-        existing = next(
-            (i for i in shopping_list['items'] 
-             if normalize_ingredient_name(i.get('name', '')) == normalize_ingredient_name(item_data.get('name', ''))),
-            None
-        )
-        
-        if not existing:
-            new_item = ShoppingListItem(
-                name=item_data.get('name', ''),
-                quantity=str(item_data.get('quantity', '1')),
-                unit=item_data.get('unit', ''),
-                category=item_data.get('category', 'other'),
-                checked=False,
-                recipe_source="Pantry Low Stock"
-            ).model_dump()
-            shopping_list['items'].append(new_item)
-            added_count += 1
-    
-    shopping_list['updated_at'] = datetime.now(timezone.utc).isoformat()
-    
-    await db.shopping_lists.update_one(query, {"$set": shopping_list})
+        norm_name = normalize_ingredient_name(item_data.get('name', ''))
+        if norm_name in seen_names:
+            continue
+        seen_names.add(norm_name)
+        new_items.append(ShoppingListItem(
+            name=item_data.get('name', ''),
+            quantity=str(item_data.get('quantity', '1')),
+            unit=item_data.get('unit', ''),
+            category=item_data.get('category', 'other'),
+            checked=False,
+            recipe_source="Pantry Low Stock"
+        ).model_dump())
+    
+    # Append the new items (creating the list if needed) and read it back in one round trip
+    now = datetime.now(timezone.utc).isoformat()
+    shopping_list = await db.shopping_lists.find_one_and_update(
+        query,
+        {
+            "$push": {"items": {"$each": new_items}},
+            "$set": {"updated_at": now},
+            # user_id comes from the query on insert
+            "$setOnInsert": {"id": str(uuid.uuid4()), "created_at": now}
+        },
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_shopping_list_cache(user_id)
     
     if isinstance(shopping_list.get('created_at'), str):
         shopping_list['created_at'] = datetime.fromisoformat(shopping_list['created_at'])
@@ -3704,6 +3840,7 @@ async def delete_shopping_item(item_id: str, request: Request):
     shopping_list['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.shopping_lists.update_one(query, {"$set": shopping_list})
+    invalidate_shopping_list_cache(user_id)
     return {"message": "Item deleted successfully"}
 
 # ---- Weekly Plan Routes ----
@@ -3772,6 +3909,7 @@ async def get_pantry(request: Request):
         new_pantry['created_at'] = new_pantry['created_at'].isoformat()
         new_pantry['updated_at'] = new_pantry['updated_at'].isoformat()
         await db.pantry.insert_one(new_pantry)
+        invalidate_pantry_cache(user_id)
         # Re-fetch without _id
         pantry = await db.pantry.find_one(query, {"_id": 0})
     
@@ -3841,8 +3979,10 @@ async def consolidate_pantry(request: Request):
     
     if merged_count > 0:
         pantry['items'] = new_items
+        normalize_pantry_expiry(pantry['items'])
         pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
         await db.pantry.update_one(query, {"$set": pantry}, upsert=True)
+        invalidate_pantry_cache(user_id)
     
     return {
         "message": f"Consolidated pantry - merged {merged_count} duplicate items",
@@ -3990,11 +4130,18 @@ async def add_pantry_item(item_data: PantryItemCreate, request: Request):
     else:
         pantry['items'].append(new_item)
     
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.pantry.update_one(query, {"$set": pantry}, upsert=True)
+    invalidate_pantry_cache(user_id)
     
-    return {"message": "Item added to pantry", "item": new_item}
+    response = {"message": "Item added to pantry", "item": new_item}
+    # Same day arithmetic as /pantry/expiring-soon, so callers can tell where the item lands without re-fetching
+    expiry_days = expiry_epoch_days(new_item.get('expiry_date'))
+    if expiry_days is not None:
+        response["days_until_expiry"] = expiry_days - (datetime.now(timezone.utc).date().toordinal() - _EPOCH_ORDINAL)
+    return response
 
 @api_router.put("/pantry/items/{item_id}")
 async def update_pantry_item(item_id: str, update_data: PantryItemUpdate, request: Request):
@@ -4029,8 +4176,10 @@ async def update_pantry_item(item_id: str, update_data: PantryItemUpdate, reques
     if not item_found:
         raise HTTPException(status_code=404, detail="Item not found in pantry")
     
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     await db.pantry.update_one(query, {"$set": pantry})
+    invalidate_pantry_cache(user_id)
     
     return {"message": "Item updated"}
 
@@ -4046,11 +4195,34 @@ async def delete_pantry_item(item_id: str, request: Request):
         raise HTTPException(status_code=404, detail="Pantry not found")
     
     pantry['items'] = [item for item in pantry['items'] if item['id'] != item_id]
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     
     await db.pantry.update_one(query, {"$set": pantry})
+    invalidate_pantry_cache(user_id)
     return {"message": "Item removed from pantry"}
 
+@api_router.post("/pantry/items/bulk-delete")
+async def bulk_delete_pantry_items(data: BulkDeleteRequest, request: Request):
+    """Remove several items from the pantry in one write"""
+    user_id = await get_user_id_or_none(request)
+    
+    query = {"user_id": user_id} if user_id else {"user_id": None}
+    # $pull in place - the remaining items are untouched, so no re-normalization needed
+    result = await db.pantry.update_one(
+        query,
+        {
+            "$pull": {"items": {"id": {"$in": data.ids}}},
+            "$set": {"updated_at": datetime.now(timezone.utc).isoformat()}
+        }
+    )
+    
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Pantry not found")
+    
+    invalidate_pantry_cache(user_id)
+    return {"message": "Items removed from pantry", "requested": len(data.ids)}
+
 @api_router.post("/pantry/cook")
 async def cook_recipe(data: CookRecipeRequest, request: Request):
     """Deduct ingredients from pantry when cooking a recipe"""
@@ -4167,8 +4339,10 @@ async def cook_recipe(data: CookRecipeRequest, request: Request):
     # Remove items with 0 or negative quantity
     pantry['items'] = [item for item in pantry['items'] if item.get('quantity', 0) > 0]
     
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     await db.pantry.update_one(query, {"$set": pantry}, upsert=True)
+    invalidate_pantry_cache(user_id)
     
     return {
         "message": f"Cooked {recipe['name']}",
@@ -4340,8 +4514,10 @@ async def add_from_shopping_list(request: Request):
             
             added_count += 1
     
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     await db.pantry.update_one(query, {"$set": pantry}, upsert=True)
+    invalidate_pantry_cache(user_id)
     
     return {"message": f"Added {added_count} items to pantry", "added": added_count}
 
@@ -4497,7 +4673,6 @@ IMPORTANT:
         logger.info(f"Receipt scan response: {result[:500] if result else 'Empty'}")
         
         # Parse response
-        import json
         clean_response = result.strip()
         
         # Remove markdown if present
@@ -4512,13 +4687,13 @@ IMPORTANT:
         
         # Try to parse JSON
         try:
-            items_data = json.loads(clean_response)
-        except json.JSONDecodeError:
+            items_data = orjson.loads(clean_response)
+        except orjson.JSONDecodeError:
             # Try to find JSON array in response
             start = clean_response.find("[")
             end = clean_response.rfind("]") + 1
             if start >= 0 and end > start:
-                items_data = json.loads(clean_response[start:end])
+                items_data = orjson.loads(clean_response[start:end])
             else:
                 logger.error(f"Could not parse receipt JSON: {clean_response}")
                 return {"extracted_items": [], "message": "Could not parse receipt. Please try a clearer image."}
@@ -4568,6 +4743,8 @@ async def add_from_receipt(request: Request):
     
     added_count = 0
     updated_count = 0
+    # Resulting pantry entries keyed by id, echoed back so callers needn't re-fetch the pantry
+    touched = {}
     
     def find_matching_pantry_item(new_name: str, pantry_items: list) -> int:
         """Find a matching pantry item using fuzzy matching"""
@@ -4651,6 +4828,7 @@ async def add_from_receipt(request: Request):
                     pantry['items'][existing_idx]['quantity'] += qty
             
             pantry['items'][existing_idx]['last_updated'] = datetime.now(timezone.utc).isoformat()
+            touched[existing_item['id']] = existing_item
             updated_count += 1
             logger.info(f"Consolidated '{name}' with existing '{existing_item['name']}'")
         else:
@@ -4664,15 +4842,19 @@ async def add_from_receipt(request: Request):
             ).model_dump()
             new_item['last_updated'] = new_item['last_updated'].isoformat()
             pantry['items'].append(new_item)
+            touched[new_item['id']] = new_item
             added_count += 1
     
+    normalize_pantry_expiry(pantry['items'])
     pantry['updated_at'] = datetime.now(timezone.utc).isoformat()
     await db.pantry.update_one(query, {"$set": pantry}, upsert=True)
+    invalidate_pantry_cache(user_id)
     
     return {
         "message": f"Added {added_count} new items, updated {updated_count} existing items",
         "added": added_count,
-        "updated": updated_count
+        "updated": updated_count,
+        "items": list(touched.values())
     }
 
 # ============== RECIPE UPDATE/EDIT ENDPOINT ==============
@@ -4720,11 +4902,12 @@ async def update_recipe(recipe_id: str, update_data: RecipeUpdate, request: Requ
     if update_data.categories is not None:
         update_dict["categories"] = update_data.categories
     
+    # Return updated recipe - the post-update document comes back with the write
+    updated_recipe = recipe
     if update_dict:
-        await db.recipes.update_one(query, {"$set": update_dict})
-    
-    # Return updated recipe
-    updated_recipe = await db.recipes.find_one(query, {"_id": 0})
+        updated_recipe = await db.recipes.find_one_and_update(
+            query, {"$set": update_dict}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        ) or recipe
     if isinstance(updated_recipe.get('created_at'), str):
         updated_recipe['created_at'] = datetime.fromisoformat(updated_recipe['created_at'])
     return updated_recipe
@@ -4829,8 +5012,11 @@ class CreateImportTokenResponse(BaseModel):
     recipe_count: int
     message: str
 
+# Expired and used tokens are kept this long past expiry so links still answer 410 rather than 404
+IMPORT_TOKEN_PURGE_GRACE = timedelta(days=1)
+
 @api_router.post("/recipes/share")
-async def create_private_share_link(data: PrivateShareRequest, request: Request):
+async def create_private_share_link(data: PrivateShareRequest, request: Request, background_tasks: BackgroundTasks):
     """Create a private import link for recipes (copyright-safe)
     
     This creates a single-use, time-limited token that allows a friend to import
@@ -4845,12 +5031,19 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Sign in to share recipes")
     
+    now = datetime.now(timezone.utc)
+    expires = now + timedelta(minutes=15)
+    
     # Process each recipe for safe sharing
     safe_recipes = []
     compliance_issues = []
     
     for recipe_id in data.recipe_ids:
-        recipe = await db.recipes.find_one({"id": recipe_id, "user_id": user_id}, {"_id": 0})
+        recipe = await db.recipes.find_one(
+            {"id": recipe_id, "user_id": user_id},
+            {"_id": 0, "name": 1, "instructions": 1, "ingredients": 1, "prep_time": 1, "cook_time": 1,
+             "nutrition": 1, "servings": 1, "source_url": 1, "categories": 1}
+        )
         if not recipe:
             continue
         
@@ -4864,10 +5057,10 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
             safe_recipes.append(existing_safe)
             continue
         
-        # Check domain quota
+        # Reserve domain quota
         source_url = recipe.get("source_url", "")
         domain = extract_domain(source_url)
-        if domain and not await check_domain_quota(domain):
+        if domain and not await claim_domain_quota(domain):
             compliance_issues.append(f"Quota exceeded for {domain}")
             continue
         
@@ -4875,43 +5068,77 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
             # Parse instructions into step graph
             original_instructions = recipe.get("instructions", [])
             ingredients = recipe.get("ingredients", [])
+            src_hash = hash_source_content(" ".join(original_instructions))
             
             step_graph = parse_to_step_graph(original_instructions, ingredients)
             
-            # AI rewrite instructions in original wording
-            rewrite_result = await rewrite_instructions_with_ai(
-                step_graph=step_graph,
-                ingredients=ingredients,
-                original_title=recipe.get("name", ""),
-                original_instructions=original_instructions
+            # Reuse a compliant rewrite of the same source text if we have one
+            cached = await db.rewrite_cache.find_one(
+                {"source_hash": src_hash, "prompt_version": PROMPT_VERSION},
+                {"_id": 0}
             )
             
-            # Validate compliance
-            compliance = await validate_compliance(
-                original_instructions=original_instructions,
-                rewritten_instructions=rewrite_result["method_rewritten"],
-                check_semantic=False  # Only check semantic for borderline cases
-            )
+            if cached and cached.get("compliance", {}).get("passed_compliance"):
+                rewrite_result = {
+                    "method_rewritten": cached["method_rewritten"],
+                    "title_generic": cached["title_generic"],
+                    "notes": cached.get("notes", "")
+                }
+                compliance = ComplianceMetrics(**cached["compliance"])
+            else:
+                # AI rewrite instructions in original wording
+                rewrite_result = await rewrite_instructions_single_flight(
+                    src_hash,
+                    step_graph=step_graph,
+                    ingredients=ingredients,
+                    original_title=recipe.get("name", ""),
+                    original_instructions=original_instructions
+                )
+                
+                # Validate compliance
+                compliance = await validate_compliance(
+                    original_instructions=original_instructions,
+                    rewritten_instructions=rewrite_result["method_rewritten"],
+                    check_semantic=False  # Only check semantic for borderline cases
+                )
             
             # If compliance failed, try regeneration with stricter prompt
             if not compliance.passed_compliance:
                 logger.warning(f"First compliance check failed for recipe {recipe_id}, retrying...")
+                first_hash = hash_rewrite(rewrite_result["method_rewritten"])
                 rewrite_result = await rewrite_instructions_with_ai(
                     step_graph=step_graph,
                     ingredients=ingredients,
                     original_title=recipe.get("name", ""),
                     original_instructions=original_instructions
                 )
-                compliance = await validate_compliance(
-                    original_instructions=original_instructions,
-                    rewritten_instructions=rewrite_result["method_rewritten"],
-                    check_semantic=True  # Full check on retry
-                )
+                # The semantic gate only makes the check stricter, so an identical
+                # rewrite would fail again - keep the failed result
+                if hash_rewrite(rewrite_result["method_rewritten"]) != first_hash:
+                    compliance = await validate_compliance(
+                        original_instructions=original_instructions,
+                        rewritten_instructions=rewrite_result["method_rewritten"],
+                        check_semantic=True  # Full check on retry
+                    )
             
             if not compliance.passed_compliance:
+                await release_domain_quota(domain)
                 compliance_issues.append(f"Could not generate compliant version of '{recipe.get('name')}'")
                 continue
             
+            if not cached:
+                await db.rewrite_cache.update_one(
+                    {"source_hash": src_hash, "prompt_version": PROMPT_VERSION},
+                    {"$set": {
+                        "method_rewritten": rewrite_result["method_rewritten"],
+                        "title_generic": rewrite_result["title_generic"],
+                        "notes": rewrite_result.get("notes", ""),
+                        "compliance": compliance.model_dump(),
+                        "cached_at": now  # BSON date for TTL index
+                    }},
+                    upsert=True
+                )
+            
             # Calculate total time
             prep_time = recipe.get("prep_time", "")
             cook_time = recipe.get("cook_time", "")
@@ -4920,8 +5147,8 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
             # Try to parse times if step graph didn't capture them
             if not total_min:
                 try:
-                    prep_min = int(re.search(r'(\d+)', prep_time).group(1)) if prep_time else 0
-                    cook_min = int(re.search(r'(\d+)', cook_time).group(1)) if cook_time else 0
+                    prep_min = int(_DIGITS_RE.search(prep_time).group(1)) if prep_time else 0
+                    cook_min = int(_DIGITS_RE.search(cook_time).group(1)) if cook_time else 0
                     total_min = prep_min + cook_min
                 except:
                     total_min = 30  # Default
@@ -4941,8 +5168,8 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
                 "adapted_from_domain": domain if domain else None,
                 "compliance": compliance.model_dump(),
                 "categories": recipe.get("categories", []),
-                "source_hash": hash_source_content(" ".join(original_instructions)),  # For audit
-                "created_at": datetime.now(timezone.utc).isoformat(),
+                "source_hash": src_hash,  # For audit
+                "created_at": now.isoformat(),
                 # NO images from source - user must add their own
                 "user_images": []
             }
@@ -4954,13 +5181,10 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
                 upsert=True
             )
             
-            # Increment domain quota
-            if domain:
-                await increment_domain_quota(domain)
-            
             safe_recipes.append(safe_recipe)
             
         except Exception as e:
+            await release_domain_quota(domain)
             logger.error(f"Error processing recipe {recipe_id} for sharing: {e}")
             compliance_issues.append(f"Error processing '{recipe.get('name', 'Unknown')}'")
     
@@ -4977,15 +5201,18 @@ async def create_private_share_link(data: PrivateShareRequest, request: Request)
         "recipe_ids": [r["id"] for r in safe_recipes],
         "sender_id": user_id,
         "scope": "private-import-only",
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "expires_at": (datetime.now(timezone.utc) + timedelta(minutes=15)).isoformat(),
+        # Native datetimes are stored as BSON dates so the TTL index can expire them
+        "created_at": now,
+        "expires_at": expires,
+        # The TTL index purges on this, not expires_at
+        "purge_at": expires + IMPORT_TOKEN_PURGE_GRACE,
         "used": False,
         "recipe_count": len(safe_recipes)
     }
     await db.import_tokens.insert_one(token_doc)
     
-    # Log for governance
-    logger.info(f"Private share token created by {user_id} for {len(safe_recipes)} recipes")
+    # Log for governance (after the response is sent)
+    background_tasks.add_task(logger.info, "Private share token created by %s for %d recipes", user_id, len(safe_recipes))
     
     return {
         "token": token,
@@ -5012,11 +5239,11 @@ async def get_share_preview(token: str):
     if token_doc.get("used"):
         raise HTTPException(status_code=410, detail="This link has already been used")
     
+    # BSON dates come back naive, in UTC
     expires_at = token_doc.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    if not isinstance(expires_at, datetime):
+        raise HTTPException(status_code=410, detail="This link has expired")
+    expires_at = expires_at.replace(tzinfo=timezone.utc)
     
     if datetime.now(timezone.utc) > expires_at:
         raise HTTPException(status_code=410, detail="This link has expired")
@@ -5024,58 +5251,69 @@ async def get_share_preview(token: str):
     # Return minimal preview - NO content
     return {
         "recipe_count": token_doc.get("recipe_count", 0),
-        "expires_at": token_doc.get("expires_at"),
+        "expires_at": expires_at.isoformat(),
         "message": "Sign in to import these recipes to your private library",
         "legal_notice": "Recipes contain ingredients (facts) and originally-worded instructions. No third-party images or text."
     }
 
 @api_router.post("/recipes/import-shared/{token}")
-async def import_private_recipes(token: str, request: Request):
+async def import_private_recipes(token: str, request: Request, background_tasks: BackgroundTasks):
     """Import recipes from a private share link into user's library
     
     This is the core of copyright-safe sharing:
     1. Validates token (single-use, not expired)
     2. Copies ONLY safe fields (facts + rewritten instructions)
     3. NO third-party images or original prose
-    4. Invalidates token after use
+    4. Token is claimed atomically, so it can only ever be used once
     """
     user_id = await get_user_id_or_none(request)
     if not user_id:
         raise HTTPException(status_code=401, detail="Sign in to import recipes")
     
-    # Find and validate token
-    token_doc = await db.import_tokens.find_one({"token": token}, {"_id": 0})
+    # Atomically claim the token (single-use) - only one concurrent import can win
+    now = datetime.now(timezone.utc)
+    token_doc = await db.import_tokens.find_one_and_update(
+        {
+            "token": token,
+            "used": False,
+            "scope": "private-import-only",
+            "sender_id": {"$ne": user_id},  # Don't allow self-import
+            "expires_at": {"$gt": now}
+        },
+        {"$set": {"used": True, "used_at": now.isoformat(), "used_by": user_id}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     
     if not token_doc:
-        raise HTTPException(status_code=404, detail="Link not found")
-    
-    if token_doc.get("used"):
-        raise HTTPException(status_code=410, detail="This link has already been used")
-    
-    if token_doc.get("scope") != "private-import-only":
-        raise HTTPException(status_code=400, detail="Invalid link scope")
-    
-    # Check expiry
-    expires_at = token_doc.get("expires_at")
-    if isinstance(expires_at, str):
-        expires_at = datetime.fromisoformat(expires_at)
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=timezone.utc)
-    
-    if datetime.now(timezone.utc) > expires_at:
+        # Claim failed - look the token up to report why
+        token_doc = await db.import_tokens.find_one({"token": token}, {"_id": 0})
+        
+        if not token_doc:
+            raise HTTPException(status_code=404, detail="Link not found")
+        
+        if token_doc.get("used"):
+            raise HTTPException(status_code=410, detail="This link has already been used")
+        
+        if token_doc.get("scope") != "private-import-only":
+            raise HTTPException(status_code=400, detail="Invalid link scope")
+        
+        if token_doc.get("sender_id") == user_id:
+            raise HTTPException(status_code=400, detail="Cannot import your own shared recipes")
+        
         raise HTTPException(status_code=410, detail="This link has expired")
     
-    # Don't allow self-import
-    if token_doc.get("sender_id") == user_id:
-        raise HTTPException(status_code=400, detail="Cannot import your own shared recipes")
-    
     # Import safe recipes
     imported = []
     recipe_ids = token_doc.get("recipe_ids", [])
     
     for safe_recipe_id in recipe_ids:
         # Get safe recipe version
-        safe_recipe = await db.safe_recipes.find_one({"id": safe_recipe_id}, {"_id": 0})
+        safe_recipe = await db.safe_recipes.find_one(
+            {"id": safe_recipe_id},
+            {"_id": 0, "compliance.passed_compliance": 1, "ingredients": 1, "time_total_min": 1, "title_generic": 1,
+             "servings": 1, "method_rewritten": 1, "categories": 1, "adapted_from_domain": 1}
+        )
         
         if not safe_recipe:
             continue
@@ -5128,14 +5366,8 @@ async def import_private_recipes(token: str, request: Request):
         except Exception as e:
             logger.error(f"Error importing safe recipe: {e}")
     
-    # Invalidate token (single-use)
-    await db.import_tokens.update_one(
-        {"token": token},
-        {"$set": {"used": True, "used_at": datetime.now(timezone.utc).isoformat(), "used_by": user_id}}
-    )
-    
-    # Log for governance
-    logger.info(f"Private import completed: {len(imported)} recipes imported by {user_id}")
+    # Log for governance (after the response is sent)
+    background_tasks.add_task(logger.info, "Private import completed: %d recipes imported by %s", len(imported), user_id)
     
     return {
         "imported": imported,
@@ -5164,6 +5396,82 @@ async def get_shared_recipes_legacy(share_id: str):
 
 # ============== AI RECIPE GENERATION FROM PANTRY ==============
 
+# Short-lived per-user pantry snapshots so back-to-back generations skip the refetch.
+# Every pantry write calls invalidate_pantry_cache.
+_PANTRY_CACHE = TTLCache(maxsize=4096, ttl=20)
+
+def invalidate_pantry_cache(user_id: Optional[str]):
+    _PANTRY_CACHE.pop(user_id, None)
+
+async def _get_pantry_snapshot(user_id: Optional[str]) -> tuple:
+    """Return (pantry, expiring_items) for a user, cached briefly"""
+    if user_id in _PANTRY_CACHE:
+        return _PANTRY_CACHE[user_id]
+    
+    # Expiring items are selected, shaped and sorted server-side on the indexed expiry_epoch_days
+    query = {"user_id": user_id} if user_id else {"user_id": None}
+    today_days = datetime.now(timezone.utc).date().toordinal() - _EPOCH_ORDINAL
+    pipeline = [
+        {"$match": query},
+        {"$project": {
+            "_id": 0,
+            "items.name": 1,
+            "items.quantity": 1,
+            "items.unit": 1,
+            "items.category": 1,
+            "items.expiry_date": 1,
+            "items.expiry_epoch_days": 1
+        }},
+        {"$facet": {
+            "pantry": [{"$limit": 1}],
+            "expiring": [
+                {"$unwind": "$items"},
+                {"$match": {"items.expiry_epoch_days": {"$lte": today_days + 7}}},
+                {"$sort": {"items.expiry_epoch_days": 1}},
+                {"$project": {
+                    "name": "$items.name",
+                    "days_until_expiry": {"$subtract": ["$items.expiry_epoch_days", today_days]},
+                    "quantity": "$items.quantity",
+                    "unit": "$items.unit"
+                }}
+            ]
+        }}
+    ]
+    result = (await db.pantry.aggregate(pipeline).to_list(1))[0]
+    pantry = result["pantry"][0] if result["pantry"] else None
+    expiring_items = result["expiring"]
+    
+    # Items saved before expiry_epoch_days existed still need parsing
+    legacy_items = [
+        item for item in (pantry or {}).get('items', [])
+        if item.get('expiry_date') and 'expiry_epoch_days' not in item
+    ]
+    for item in legacy_items:
+        epoch_days = expiry_epoch_days(item['expiry_date'])
+        if epoch_days is not None and epoch_days <= today_days + 7:
+            expiring_items.append({
+                'name': item.get('name'),
+                'days_until_expiry': epoch_days - today_days,
+                'quantity': item.get('quantity'),
+                'unit': item.get('unit')
+            })
+    if legacy_items:
+        expiring_items.sort(key=lambda x: x['days_until_expiry'])
+    
+    _PANTRY_CACHE[user_id] = (pantry, expiring_items)
+    return pantry, expiring_items
+
+async def stream_chat_completion(**kwargs) -> str:
+    """Run a streamed chat completion and return the full message text
+    Tokens are consumed as they arrive instead of waiting on one large response body.
+    """
+    stream = await openai_client.chat.completions.create(stream=True, **kwargs)
+    parts = []
+    async for chunk in stream:
+        if chunk.choices:
+            parts.append(chunk.choices[0].delta.content or "")
+    return "".join(parts)
+
 class GenerateRecipeRequest(BaseModel):
     meal_type: Optional[str] = None
     expiring_soon: bool = False
@@ -5179,9 +5487,7 @@ async def generate_ai_recipe_from_pantry(request: Request, data: GenerateRecipeR
     # Get previously suggested recipes to avoid (from query param)
     avoid_recipes = data.avoid_recipes if data and hasattr(data, 'avoid_recipes') else []
     
-    # Get pantry
-    query = {"user_id": user_id} if user_id else {"user_id": None}
-    pantry = await db.pantry.find_one(query, {"_id": 0})
+    pantry, expiring_items = await _get_pantry_snapshot(user_id)
     
     if not pantry or not pantry.get('items'):
         raise HTTPException(status_code=400, detail="Add items to your pantry first")
@@ -5189,32 +5495,6 @@ async def generate_ai_recipe_from_pantry(request: Request, data: GenerateRecipeR
     if not openai_client:
         raise HTTPException(status_code=500, detail="AI service not configured")
     
-    # Find expiring items
-    today = datetime.now(timezone.utc).date()
-    expiring_items = []
-    for item in pantry['items']:
-        if item.get('expiry_date'):
-            try:
-                expiry_str = item['expiry_date']
-                if 'T' in expiry_str:
-                    expiry = datetime.fromisoformat(expiry_str.replace('Z', '+00:00')).date()
-                else:
-                    expiry = datetime.strptime(expiry_str, '%Y-%m-%d').date()
-                
-                days_until = (expiry - today).days
-                if days_until <= 7:
-                    expiring_items.append({
-                        'name': item.get('name'),
-                        'days_until_expiry': days_until,
-                        'quantity': item.get('quantity'),
-                        'unit': item.get('unit')
-                    })
-            except:
-                pass
-    
-    # Sort expiring items by days until expiry
-    expiring_items.sort(key=lambda x: x['days_until_expiry'])
-    
     # If filtering by expiring and no expiring items, return error
     if filter_expiring and not expiring_items:
         raise HTTPException(status_code=400, detail="No ingredients expiring soon! Your pantry is fresh.")
@@ -5306,27 +5586,25 @@ Categories can be: vegan, vegetarian, pescatarian, low-fat, quick-easy
 Return ONLY valid JSON, no markdown."""
         
         # Format ALL pantry items - highlight variety
-        pantry_items_list = [item for item in pantry['items'] if item.get('quantity', 0) > 0]
-        
         # Group by category for better AI understanding
         categorized_items = {}
-        for item in pantry_items_list:
-            cat = item.get('category', 'other')
-            if cat not in categorized_items:
-                categorized_items[cat] = []
-            categorized_items[cat].append(f"{item.get('name', '')} ({item.get('quantity', '')} {item.get('unit', '')})")
+        for item in pantry['items']:
+            if item.get('quantity', 0) > 0:
+                categorized_items.setdefault(item.get('category', 'other'), []).append(
+                    f"{item.get('name', '')} ({item.get('quantity', '')} {item.get('unit', '')})"
+                )
         
-        pantry_text = ""
-        for cat, items in categorized_items.items():
-            if items:
-                pantry_text += f"\n{cat.upper()}:\n- " + "\n- ".join(items)
+        pantry_text = "".join(
+            f"\n{cat.upper()}:\n- " + "\n- ".join(items)
+            for cat, items in categorized_items.items()
+        )
         
         # Build the prompt based on filter
         if filter_expiring:
-            expiring_text = "\n".join([
+            expiring_text = "\n".join(
                 f"- {item['name']} ({item['quantity']} {item['unit']}) - EXPIRES IN {item['days_until_expiry']} DAYS!"
                 for item in expiring_items
-            ])
+            )
             user_prompt = f"""Create a recipe that PRIMARILY USES these EXPIRING ingredients:
 
 🚨 EXPIRING SOON - MUST USE:
@@ -5342,10 +5620,10 @@ Be creative and explore all available ingredients!"""
             # Standard prompt with expiring items as optional priority
             expiring_context = ""
             if expiring_items:
-                expiring_text = "\n".join([
+                expiring_text = "\n".join(
                     f"- {item['name']} (expires in {item['days_until_expiry']} days)"
                     for item in expiring_items[:5]
-                ])
+                )
                 expiring_context = f"\n\nPRIORITY - These ingredients are expiring soon and could be incorporated:\n{expiring_text}"
             
             user_prompt = f"""Create a delicious and UNIQUE recipe using these available ingredients:
@@ -5358,38 +5636,22 @@ IMPORTANT:
 - Use a good variety of what's available
 - If absolutely necessary, you can include 1-2 common staples like salt, pepper, or oil"""
         
-        response = await openai_client.chat.completions.create(
+        result = await stream_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_prompt}
             ],
             max_tokens=2000,
-            temperature=0.9  # Higher temperature for more variety
+            temperature=0.9,  # Higher temperature for more variety
+            response_format={"type": "json_object"}
         )
         
-        result = response.choices[0].message.content
-        
-        clean_response = result.strip()
-        
-        if "```json" in clean_response:
-            clean_response = clean_response.split("```json")[1].split("```")[0]
-        elif "```" in clean_response:
-            parts = clean_response.split("```")
-            if len(parts) >= 2:
-                clean_response = parts[1]
-        
-        clean_response = clean_response.strip()
-        
         try:
-            recipe_data = json.loads(clean_response)
-        except json.JSONDecodeError:
-            start = clean_response.find("{")
-            end = clean_response.rfind("}") + 1
-            if start >= 0 and end > start:
-                recipe_data = json.loads(clean_response[start:end])
-            else:
-                raise HTTPException(status_code=500, detail="Failed to parse AI response")
+            recipe_data = orjson.loads(result)
+        except orjson.JSONDecodeError:
+            logger.error(f"Failed to parse recipe JSON: {result[:200]}")
+            raise HTTPException(status_code=500, detail="Failed to parse AI response")
         
         return {
             "recipe": recipe_data,
@@ -5416,8 +5678,7 @@ async def generate_ai_cocktail_from_pantry(request: Request, data: GenerateCockt
     logger.info(f"Generating cocktail for user {user_id}, alcoholic preference: {alcoholic_preference}")
     
     # Get pantry
-    query = {"user_id": user_id} if user_id else {"user_id": None}
-    pantry = await db.pantry.find_one(query, {"_id": 0})
+    pantry, _ = await _get_pantry_snapshot(user_id)
     
     if not pantry or not pantry.get('items'):
         raise HTTPException(status_code=400, detail="Add items to your pantry first")
@@ -5426,14 +5687,10 @@ async def generate_ai_cocktail_from_pantry(request: Request, data: GenerateCockt
         raise HTTPException(status_code=500, detail="AI service not configured - check OPENAI_API_KEY")
     
     # Build ingredient list from pantry
-    pantry_items = []
-    for item in pantry['items']:
-        name = item.get('name', '')
-        quantity = item.get('quantity', '')
-        unit = item.get('unit', '')
-        pantry_items.append(f"{name}: {quantity} {unit}".strip())
-    
-    pantry_list = "\n".join(pantry_items)
+    pantry_list = "\n".join(
+        f"{item.get('name', '')}: {item.get('quantity', '')} {item.get('unit', '')}"
+        for item in pantry['items']
+    )
     
     # Determine drink type preference
     drink_type_context = ""
@@ -5477,36 +5734,23 @@ Return ONLY valid JSON, no markdown."""
 
 Suggest a creative {'' if alcoholic_preference is None else ('alcoholic ' if alcoholic_preference else 'non-alcoholic ')}drink I can make!"""
         
-        response = await openai_client.chat.completions.create(
+        ai_response = await stream_chat_completion(
             model="gpt-4o-mini",
             messages=[
                 {"role": "system", "content": system_msg},
                 {"role": "user", "content": user_msg}
             ],
             temperature=0.9,
-            max_tokens=1500
+            max_tokens=1500,
+            response_format={"type": "json_object"}
         )
-        
-        ai_response = response.choices[0].message.content
         logger.info(f"Cocktail AI response received: {len(ai_response)} chars")
         
-        # Parse JSON response
-        clean_response = ai_response.strip()
-        if clean_response.startswith("```"):
-            clean_response = clean_response.split("```")[1]
-            if clean_response.startswith("json"):
-                clean_response = clean_response[4:]
-        
         try:
-            cocktail_data = json.loads(clean_response)
-        except json.JSONDecodeError:
-            start = clean_response.find("{")
-            end = clean_response.rfind("}") + 1
-            if start >= 0 and end > start:
-                cocktail_data = json.loads(clean_response[start:end])
-            else:
-                logger.error(f"Failed to parse cocktail JSON: {clean_response[:200]}")
-                raise HTTPException(status_code=500, detail="Failed to parse AI response")
+            cocktail_data = orjson.loads(ai_response)
+        except orjson.JSONDecodeError:
+            logger.error(f"Failed to parse cocktail JSON: {ai_response[:200]}")
+            raise HTTPException(status_code=500, detail="Failed to parse AI response")
         
         return {
             "cocktail": cocktail_data,
@@ -5520,79 +5764,6 @@ Suggest a creative {'' if alcoholic_preference is None else ('alcoholic ' if alc
 
 # ============== SHOPPING LIST COST ESTIMATION ==============
 
-# UK supermarket average prices (£ per standard unit) with loyalty card prices
-# Loyalty cards: Tesco Clubcard, Sainsbury's Nectar, Asda Blue Light (staff only so standard), Morrisons More
-UK_PRICE_DATA = {
-    # Produce - per item prices
-    "tomato": {"price": 0.30, "unit": "each", "tesco": 0.28, "tesco_clubcard": 0.22, "sainsburys": 0.32, "sainsburys_nectar": 0.28, "aldi": 0.22, "lidl": 0.20, "asda": 0.25, "morrisons": 0.29, "morrisons_more": 0.26},
-    "onion": {"price": 0.15, "unit": "each", "tesco": 0.15, "tesco_clubcard": 0.12, "sainsburys": 0.18, "sainsburys_nectar": 0.15, "aldi": 0.10, "lidl": 0.10, "asda": 0.12, "morrisons": 0.14, "morrisons_more": 0.12},
-    "garlic": {"price": 0.40, "unit": "bulb", "tesco": 0.40, "tesco_clubcard": 0.35, "sainsburys": 0.45, "sainsburys_nectar": 0.40, "aldi": 0.29, "lidl": 0.29, "asda": 0.35, "morrisons": 0.40, "morrisons_more": 0.35},
-    "potato": {"price": 0.20, "unit": "each", "tesco": 0.20, "tesco_clubcard": 0.15, "sainsburys": 0.22, "sainsburys_nectar": 0.18, "aldi": 0.15, "lidl": 0.15, "asda": 0.18, "morrisons": 0.20, "morrisons_more": 0.17},
-    "carrot": {"price": 0.10, "unit": "each", "tesco": 0.10, "tesco_clubcard": 0.08, "sainsburys": 0.12, "sainsburys_nectar": 0.10, "aldi": 0.07, "lidl": 0.07, "asda": 0.08, "morrisons": 0.10, "morrisons_more": 0.08},
-    "pepper": {"price": 0.70, "unit": "each", "tesco": 0.70, "tesco_clubcard": 0.55, "sainsburys": 0.80, "sainsburys_nectar": 0.65, "aldi": 0.49, "lidl": 0.49, "asda": 0.60, "morrisons": 0.65, "morrisons_more": 0.55},
-    "broccoli": {"price": 0.89, "unit": "head", "tesco": 0.89, "tesco_clubcard": 0.69, "sainsburys": 0.99, "sainsburys_nectar": 0.79, "aldi": 0.69, "lidl": 0.69, "asda": 0.79, "morrisons": 0.85, "morrisons_more": 0.75},
-    "lettuce": {"price": 0.65, "unit": "head", "tesco": 0.65, "tesco_clubcard": 0.50, "sainsburys": 0.75, "sainsburys_nectar": 0.60, "aldi": 0.49, "lidl": 0.49, "asda": 0.55, "morrisons": 0.60, "morrisons_more": 0.52},
-    "mushroom": {"price": 1.20, "unit": "250g", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.35, "sainsburys_nectar": 1.10, "aldi": 0.89, "lidl": 0.89, "asda": 1.00, "morrisons": 1.15, "morrisons_more": 0.99},
-    "spinach": {"price": 1.50, "unit": "bag", "tesco": 1.50, "tesco_clubcard": 1.20, "sainsburys": 1.65, "sainsburys_nectar": 1.35, "aldi": 1.09, "lidl": 1.09, "asda": 1.30, "morrisons": 1.45, "morrisons_more": 1.25},
-    "celery": {"price": 0.75, "unit": "bunch", "tesco": 0.75, "tesco_clubcard": 0.59, "sainsburys": 0.85, "sainsburys_nectar": 0.69, "aldi": 0.55, "lidl": 0.55, "asda": 0.65, "morrisons": 0.72, "morrisons_more": 0.62},
-    "cucumber": {"price": 0.55, "unit": "each", "tesco": 0.55, "tesco_clubcard": 0.45, "sainsburys": 0.65, "sainsburys_nectar": 0.52, "aldi": 0.39, "lidl": 0.39, "asda": 0.48, "morrisons": 0.52, "morrisons_more": 0.45},
-    "courgette": {"price": 0.50, "unit": "each", "tesco": 0.50, "tesco_clubcard": 0.40, "sainsburys": 0.60, "sainsburys_nectar": 0.48, "aldi": 0.35, "lidl": 0.35, "asda": 0.42, "morrisons": 0.48, "morrisons_more": 0.40},
-    "aubergine": {"price": 0.85, "unit": "each", "tesco": 0.85, "tesco_clubcard": 0.69, "sainsburys": 0.99, "sainsburys_nectar": 0.79, "aldi": 0.65, "lidl": 0.65, "asda": 0.75, "morrisons": 0.82, "morrisons_more": 0.70},
-    "lemon": {"price": 0.35, "unit": "each", "tesco": 0.35, "tesco_clubcard": 0.28, "sainsburys": 0.40, "sainsburys_nectar": 0.32, "aldi": 0.25, "lidl": 0.25, "asda": 0.30, "morrisons": 0.33, "morrisons_more": 0.28},
-    "lime": {"price": 0.30, "unit": "each", "tesco": 0.30, "tesco_clubcard": 0.24, "sainsburys": 0.35, "sainsburys_nectar": 0.28, "aldi": 0.20, "lidl": 0.20, "asda": 0.25, "morrisons": 0.28, "morrisons_more": 0.24},
-    "ginger": {"price": 0.80, "unit": "piece", "tesco": 0.80, "tesco_clubcard": 0.65, "sainsburys": 0.95, "sainsburys_nectar": 0.76, "aldi": 0.55, "lidl": 0.55, "asda": 0.68, "morrisons": 0.75, "morrisons_more": 0.65},
-    "spring onion": {"price": 0.60, "unit": "bunch", "tesco": 0.60, "tesco_clubcard": 0.48, "sainsburys": 0.70, "sainsburys_nectar": 0.56, "aldi": 0.45, "lidl": 0.45, "asda": 0.52, "morrisons": 0.58, "morrisons_more": 0.50},
-    "banana": {"price": 0.15, "unit": "each", "tesco": 0.15, "tesco_clubcard": 0.12, "sainsburys": 0.18, "sainsburys_nectar": 0.14, "aldi": 0.11, "lidl": 0.11, "asda": 0.13, "morrisons": 0.14, "morrisons_more": 0.12},
-    "apple": {"price": 0.30, "unit": "each", "tesco": 0.30, "tesco_clubcard": 0.24, "sainsburys": 0.35, "sainsburys_nectar": 0.28, "aldi": 0.22, "lidl": 0.22, "asda": 0.26, "morrisons": 0.29, "morrisons_more": 0.25},
-    # Dairy
-    "milk": {"price": 1.55, "unit": "liter", "tesco": 1.55, "tesco_clubcard": 1.35, "sainsburys": 1.60, "sainsburys_nectar": 1.45, "aldi": 1.09, "lidl": 1.09, "asda": 1.35, "morrisons": 1.50, "morrisons_more": 1.35},
-    "cheese": {"price": 2.50, "unit": "250g", "tesco": 2.50, "tesco_clubcard": 2.00, "sainsburys": 2.75, "sainsburys_nectar": 2.25, "aldi": 1.89, "lidl": 1.89, "asda": 2.20, "morrisons": 2.40, "morrisons_more": 2.00},
-    "cheddar": {"price": 2.50, "unit": "250g", "tesco": 2.50, "tesco_clubcard": 2.00, "sainsburys": 2.75, "sainsburys_nectar": 2.25, "aldi": 1.89, "lidl": 1.89, "asda": 2.20, "morrisons": 2.40, "morrisons_more": 2.00},
-    "parmesan": {"price": 3.50, "unit": "100g", "tesco": 3.50, "tesco_clubcard": 2.80, "sainsburys": 3.90, "sainsburys_nectar": 3.20, "aldi": 2.49, "lidl": 2.49, "asda": 3.00, "morrisons": 3.30, "morrisons_more": 2.85},
-    "butter": {"price": 2.00, "unit": "250g", "tesco": 2.00, "tesco_clubcard": 1.65, "sainsburys": 2.20, "sainsburys_nectar": 1.85, "aldi": 1.49, "lidl": 1.49, "asda": 1.75, "morrisons": 1.90, "morrisons_more": 1.65},
-    "egg": {"price": 2.30, "unit": "6 pack", "tesco": 2.30, "tesco_clubcard": 1.89, "sainsburys": 2.50, "sainsburys_nectar": 2.10, "aldi": 1.69, "lidl": 1.69, "asda": 2.00, "morrisons": 2.20, "morrisons_more": 1.89},
-    "cream": {"price": 1.20, "unit": "300ml", "tesco": 1.20, "tesco_clubcard": 1.00, "sainsburys": 1.35, "sainsburys_nectar": 1.15, "aldi": 0.89, "lidl": 0.89, "asda": 1.05, "morrisons": 1.15, "morrisons_more": 0.99},
-    "yogurt": {"price": 1.50, "unit": "500g", "tesco": 1.50, "tesco_clubcard": 1.20, "sainsburys": 1.65, "sainsburys_nectar": 1.35, "aldi": 1.09, "lidl": 1.09, "asda": 1.30, "morrisons": 1.45, "morrisons_more": 1.25},
-    # Protein
-    "chicken": {"price": 5.50, "unit": "kg", "tesco": 5.50, "tesco_clubcard": 4.50, "sainsburys": 6.00, "sainsburys_nectar": 5.00, "aldi": 4.29, "lidl": 4.29, "asda": 4.80, "morrisons": 5.20, "morrisons_more": 4.50},
-    "chicken breast": {"price": 6.50, "unit": "kg", "tesco": 6.50, "tesco_clubcard": 5.25, "sainsburys": 7.00, "sainsburys_nectar": 5.75, "aldi": 4.99, "lidl": 4.99, "asda": 5.50, "morrisons": 6.00, "morrisons_more": 5.25},
-    "mince": {"price": 4.50, "unit": "500g", "tesco": 4.50, "tesco_clubcard": 3.60, "sainsburys": 5.00, "sainsburys_nectar": 4.00, "aldi": 3.29, "lidl": 3.29, "asda": 3.80, "morrisons": 4.20, "morrisons_more": 3.60},
-    "beef": {"price": 8.00, "unit": "kg", "tesco": 8.00, "tesco_clubcard": 6.50, "sainsburys": 9.00, "sainsburys_nectar": 7.50, "aldi": 6.49, "lidl": 6.49, "asda": 7.00, "morrisons": 7.50, "morrisons_more": 6.50},
-    "pork": {"price": 5.00, "unit": "kg", "tesco": 5.00, "tesco_clubcard": 4.00, "sainsburys": 5.50, "sainsburys_nectar": 4.50, "aldi": 3.99, "lidl": 3.99, "asda": 4.30, "morrisons": 4.70, "morrisons_more": 4.00},
-    "bacon": {"price": 2.50, "unit": "200g", "tesco": 2.50, "tesco_clubcard": 2.00, "sainsburys": 2.80, "sainsburys_nectar": 2.25, "aldi": 1.79, "lidl": 1.79, "asda": 2.10, "morrisons": 2.35, "morrisons_more": 2.00},
-    "salmon": {"price": 12.00, "unit": "kg", "tesco": 12.00, "tesco_clubcard": 9.50, "sainsburys": 13.50, "sainsburys_nectar": 11.00, "aldi": 9.99, "lidl": 9.99, "asda": 10.50, "morrisons": 11.50, "morrisons_more": 9.75},
-    "fish": {"price": 8.00, "unit": "kg", "tesco": 8.00, "tesco_clubcard": 6.50, "sainsburys": 9.00, "sainsburys_nectar": 7.50, "aldi": 6.49, "lidl": 6.49, "asda": 7.00, "morrisons": 7.50, "morrisons_more": 6.50},
-    "prawn": {"price": 8.00, "unit": "250g", "tesco": 8.00, "tesco_clubcard": 6.50, "sainsburys": 9.00, "sainsburys_nectar": 7.50, "aldi": 5.99, "lidl": 5.99, "asda": 7.00, "morrisons": 7.50, "morrisons_more": 6.50},
-    "tofu": {"price": 2.00, "unit": "280g", "tesco": 2.00, "tesco_clubcard": 1.60, "sainsburys": 2.25, "sainsburys_nectar": 1.80, "aldi": 1.49, "lidl": 1.49, "asda": 1.70, "morrisons": 1.90, "morrisons_more": 1.60},
-    # Pantry
-    "rice": {"price": 2.00, "unit": "kg", "tesco": 2.00, "tesco_clubcard": 1.65, "sainsburys": 2.20, "sainsburys_nectar": 1.85, "aldi": 1.49, "lidl": 1.49, "asda": 1.70, "morrisons": 1.90, "morrisons_more": 1.60},
-    "pasta": {"price": 1.20, "unit": "500g", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.35, "sainsburys_nectar": 1.10, "aldi": 0.75, "lidl": 0.75, "asda": 0.95, "morrisons": 1.10, "morrisons_more": 0.95},
-    "noodle": {"price": 1.50, "unit": "300g", "tesco": 1.50, "tesco_clubcard": 1.20, "sainsburys": 1.70, "sainsburys_nectar": 1.40, "aldi": 1.09, "lidl": 1.09, "asda": 1.30, "morrisons": 1.45, "morrisons_more": 1.25},
-    "flour": {"price": 1.10, "unit": "kg", "tesco": 1.10, "tesco_clubcard": 0.89, "sainsburys": 1.25, "sainsburys_nectar": 1.00, "aldi": 0.75, "lidl": 0.75, "asda": 0.90, "morrisons": 1.05, "morrisons_more": 0.89},
-    "sugar": {"price": 1.20, "unit": "kg", "tesco": 1.20, "tesco_clubcard": 0.99, "sainsburys": 1.35, "sainsburys_nectar": 1.10, "aldi": 0.89, "lidl": 0.89, "asda": 1.00, "morrisons": 1.15, "morrisons_more": 0.99},
-    "oil": {"price": 2.50, "unit": "liter", "tesco": 2.50, "tesco_clubcard": 2.00, "sainsburys": 2.80, "sainsburys_nectar": 2.30, "aldi": 1.89, "lidl": 1.89, "asda": 2.20, "morrisons": 2.40, "morrisons_more": 2.10},
-    "olive oil": {"price": 4.50, "unit": "500ml", "tesco": 4.50, "tesco_clubcard": 3.50, "sainsburys": 5.00, "sainsburys_nectar": 4.00, "aldi": 2.99, "lidl": 2.99, "asda": 3.80, "morrisons": 4.20, "morrisons_more": 3.60},
-    "bread": {"price": 1.20, "unit": "loaf", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.35, "sainsburys_nectar": 1.10, "aldi": 0.75, "lidl": 0.75, "asda": 0.95, "morrisons": 1.10, "morrisons_more": 0.95},
-    "soy sauce": {"price": 1.80, "unit": "bottle", "tesco": 1.80, "tesco_clubcard": 1.45, "sainsburys": 2.00, "sainsburys_nectar": 1.65, "aldi": 1.29, "lidl": 1.29, "asda": 1.50, "morrisons": 1.70, "morrisons_more": 1.45},
-    "honey": {"price": 3.50, "unit": "jar", "tesco": 3.50, "tesco_clubcard": 2.85, "sainsburys": 4.00, "sainsburys_nectar": 3.25, "aldi": 2.49, "lidl": 2.49, "asda": 3.00, "morrisons": 3.30, "morrisons_more": 2.85},
-    "stock": {"price": 1.20, "unit": "pot", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.40, "sainsburys_nectar": 1.15, "aldi": 0.85, "lidl": 0.85, "asda": 1.00, "morrisons": 1.15, "morrisons_more": 0.99},
-    "tin tomato": {"price": 0.65, "unit": "can", "tesco": 0.65, "tesco_clubcard": 0.52, "sainsburys": 0.75, "sainsburys_nectar": 0.60, "aldi": 0.45, "lidl": 0.45, "asda": 0.55, "morrisons": 0.62, "morrisons_more": 0.52},
-    "chopped tomato": {"price": 0.65, "unit": "can", "tesco": 0.65, "tesco_clubcard": 0.52, "sainsburys": 0.75, "sainsburys_nectar": 0.60, "aldi": 0.45, "lidl": 0.45, "asda": 0.55, "morrisons": 0.62, "morrisons_more": 0.52},
-    "coconut milk": {"price": 1.30, "unit": "can", "tesco": 1.30, "tesco_clubcard": 1.05, "sainsburys": 1.50, "sainsburys_nectar": 1.20, "aldi": 0.99, "lidl": 0.99, "asda": 1.15, "morrisons": 1.25, "morrisons_more": 1.05},
-    "passata": {"price": 0.85, "unit": "jar", "tesco": 0.85, "tesco_clubcard": 0.68, "sainsburys": 0.99, "sainsburys_nectar": 0.79, "aldi": 0.59, "lidl": 0.59, "asda": 0.72, "morrisons": 0.82, "morrisons_more": 0.68},
-    # Spices - small amounts are cheap
-    "salt": {"price": 0.65, "unit": "pack", "tesco": 0.65, "tesco_clubcard": 0.50, "sainsburys": 0.75, "sainsburys_nectar": 0.60, "aldi": 0.35, "lidl": 0.35, "asda": 0.50, "morrisons": 0.60, "morrisons_more": 0.50},
-    "black pepper": {"price": 1.50, "unit": "jar", "tesco": 1.50, "tesco_clubcard": 1.20, "sainsburys": 1.75, "sainsburys_nectar": 1.40, "aldi": 0.99, "lidl": 0.99, "asda": 1.20, "morrisons": 1.40, "morrisons_more": 1.20},
-    "cumin": {"price": 1.20, "unit": "jar", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.40, "sainsburys_nectar": 1.12, "aldi": 0.79, "lidl": 0.79, "asda": 0.99, "morrisons": 1.15, "morrisons_more": 0.95},
-    "paprika": {"price": 1.20, "unit": "jar", "tesco": 1.20, "tesco_clubcard": 0.95, "sainsburys": 1.40, "sainsburys_nectar": 1.12, "aldi": 0.79, "lidl": 0.79, "asda": 0.99, "morrisons": 1.15, "morrisons_more": 0.95},
-    "cinnamon": {"price": 1.30, "unit": "jar", "tesco": 1.30, "tesco_clubcard": 1.05, "sainsburys": 1.50, "sainsburys_nectar": 1.20, "aldi": 0.85, "lidl": 0.85, "asda": 1.05, "morrisons": 1.25, "morrisons_more": 1.05},
-    "chilli": {"price": 0.20, "unit": "each", "tesco": 0.20, "tesco_clubcard": 0.16, "sainsburys": 0.25, "sainsburys_nectar": 0.20, "aldi": 0.12, "lidl": 0.12, "asda": 0.15, "morrisons": 0.18, "morrisons_more": 0.15},
-    "herb": {"price": 1.00, "unit": "pack", "tesco": 1.00, "tesco_clubcard": 0.80, "sainsburys": 1.15, "sainsburys_nectar": 0.92, "aldi": 0.65, "lidl": 0.65, "asda": 0.85, "morrisons": 0.95, "morrisons_more": 0.80},
-    "basil": {"price": 1.00, "unit": "pack", "tesco": 1.00, "tesco_clubcard": 0.80, "sainsburys": 1.15, "sainsburys_nectar": 0.92, "aldi": 0.65, "lidl": 0.65, "asda": 0.85, "morrisons": 0.95, "morrisons_more": 0.80},
-    "coriander": {"price": 0.80, "unit": "bunch", "tesco": 0.80, "tesco_clubcard": 0.64, "sainsburys": 0.95, "sainsburys_nectar": 0.76, "aldi": 0.55, "lidl": 0.55, "asda": 0.68, "morrisons": 0.75, "morrisons_more": 0.65},
-    "parsley": {"price": 0.80, "unit": "bunch", "tesco": 0.80, "tesco_clubcard": 0.64, "sainsburys": 0.95, "sainsburys_nectar": 0.76, "aldi": 0.55, "lidl": 0.55, "asda": 0.68, "morrisons": 0.75, "morrisons_more": 0.65},
-}
-
 # Store display names and their loyalty card info
 STORE_INFO = {
     "tesco": {"display": "Tesco", "loyalty": "tesco_clubcard", "loyalty_name": "Clubcard"},
@@ -5603,152 +5774,315 @@ STORE_INFO = {
     "morrisons": {"display": "Morrisons", "loyalty": "morrisons_more", "loyalty_name": "More Card"},
 }
 
-def estimate_item_price(item_name: str, quantity: float = 1, unit: str = "") -> dict:
-    """Estimate price for a shopping item - proportional to quantity"""
-    name_lower = item_name.lower()
-    unit_lower = unit.lower().strip() if unit else ""
+STORE_COLS = [
+    "tesco", "tesco_clubcard", "sainsburys", "sainsburys_nectar",
+    "aldi", "lidl", "asda", "morrisons", "morrisons_more"
+]
+STANDARD_STORES = ("tesco", "sainsburys", "aldi", "lidl", "asda", "morrisons")
+LOYALTY_STORES = ("tesco_clubcard", "sainsburys_nectar", "morrisons_more")
+STANDARD_IDX = np.array([STORE_COLS.index(s) for s in STANDARD_STORES])
+LOYALTY_IDX = np.array([STORE_COLS.index(s) for s in LOYALTY_STORES])
+CHEAPEST_ORDER_IDX = np.concatenate([STANDARD_IDX, LOYALTY_IDX])
+# Loyalty prices fall back to the store's standard price, then the base price
+_LOYALTY_FALLBACK = {"tesco_clubcard": "tesco", "sainsburys_nectar": "sainsburys", "morrisons_more": "morrisons"}
+# e.g. "tesco" -> "Tesco", "tesco_clubcard" -> "Tesco (Clubcard)"
+STORE_DISPLAY_NAMES = {key: info["display"] for key, info in STORE_INFO.items()}
+STORE_DISPLAY_NAMES.update({
+    info["loyalty"]: f"{info['display']} ({info['loyalty_name']})" for info in STORE_INFO.values() if info["loyalty"]
+})
+
+# UK supermarket average prices (£ per standard unit) with loyalty card prices
+# Loyalty cards: Tesco Clubcard, Sainsbury's Nectar, Asda Blue Light (staff only so standard), Morrisons More
+PRICE_RECORD_DTYPE = [("name", "U32"), ("unit", "U16"), ("price", "f8")] + [(col, "f8") for col in STORE_COLS]
+
+@lru_cache(maxsize=None)
+def _uk_prices() -> np.recarray:
+    """UK supermarket price data (data/uk_prices.json), loaded on first use
+    Held as one contiguous record array rather than a dict per ingredient. Missing
+    store prices are filled in here so every record has all STORE_COLS.
+    """
+    prices = orjson.loads((ROOT_DIR / "data" / "uk_prices.json").read_bytes())
+    records = []
+    for name, row in prices.items():
+        for col in STORE_COLS:
+            if col not in row:
+                row[col] = row.get(_LOYALTY_FALLBACK.get(col), row["price"])
+        records.append((name, row.get("unit", "each"), row["price"], *(row[col] for col in STORE_COLS)))
+    return np.rec.array(records, dtype=PRICE_RECORD_DTYPE)
+
+# Store price relative to the estimate for items we have no price data for
+DEFAULT_STORE_FACTORS = np.array([1.0, 0.85, 1.1, 0.95, 0.75, 0.75, 0.9, 0.95, 0.85])
+
+@lru_cache(maxsize=None)
+def _price_table():
+    """Columnar view of the price data in whole pence - (ingredient x store matrix, base prices),
+    rows in table order, as int16 since every price is well under £327.
+    A final row holds DEFAULT_STORE_FACTORS with a base price of £1, so unmatched items priced
+    by their default estimate go through the same gather-and-scale as matched ones.
+    """
+    prices = _uk_prices()
+    price_matrix = np.vstack([
+        np.column_stack([prices[col] for col in STORE_COLS]),
+        DEFAULT_STORE_FACTORS
+    ])
+    base_prices = np.append(prices["price"], 1.0)
+    return np.rint(price_matrix * 100).astype(np.int16), np.rint(base_prices * 100).astype(np.int16)
+
+@lru_cache(maxsize=None)
+def _price_matcher():
+    """Aho-Corasick automaton over the price keys, plus the keys joined into one
+    string (with each key's start offset) for finding keys that contain a name"""
+    keys = _uk_prices()["name"].tolist()
+    automaton = ahocorasick.Automaton()
+    for i, key in enumerate(keys):
+        automaton.add_word(key, i)
+    automaton.make_automaton()
+    
+    starts = []
+    offset = 0
+    for key in keys:
+        starts.append(offset)
+        offset += len(key) + 1
+    return automaton, "\0".join(keys), starts
+
+def _price_key_matches(text: str) -> set:
+    """Row indexes of price keys that occur in text or that text occurs in"""
+    automaton, joined_keys, starts = _price_matcher()
+    found = {i for _, i in automaton.iter(text)}
+    pos = joined_keys.find(text)
+    while pos != -1:
+        found.add(bisect_right(starts, pos) - 1)
+        pos = joined_keys.find(text, pos + 1)
+    return found
+
+# Shopping-list unit classes, checked in this order (so "g" wins over "kg", "ml" over "l")
+UNIT_G, UNIT_KG, UNIT_ML, UNIT_L, UNIT_OTHER = range(5)
+# Flags describing how a price table entry is sold
+PACK_KG, PACK_G, PACK_LITRE, PACK_ML, PACK_MULTI = 1, 2, 4, 8, 16
+
+# Alternatives are tried in order from the start of the unit, so earlier classes win
+_UNIT_CLASS_RE = re.compile(r"(?P<g>(?!.*kg).*g)|(?P<kg>.*k(?:g|ilo))|(?P<ml>.*ml)|(?P<l>.*l)", re.DOTALL)
+_UNIT_CLASS_GROUPS = {"g": UNIT_G, "kg": UNIT_KG, "ml": UNIT_ML, "l": UNIT_L}
+
+def _classify_unit(unit_lower: str) -> int:
+    """Classify a lowercased shopping-list unit in a single regex match"""
+    match = _UNIT_CLASS_RE.match(unit_lower)
+    return _UNIT_CLASS_GROUPS[match.lastgroup] if match else UNIT_OTHER
+
+# Unit string -> class, seeded with the units recipes and shopping lists normally use
+UNIT_CODES = {
+    unit: _classify_unit(unit) for unit in (
+        "", "g", "gram", "grams", "kg", "kilo", "kilogram", "kilograms", "ml", "l", "liter", "litre",
+        "liters", "litres", "each", "piece", "pieces", "pcs", "clove", "cloves", "bulb", "head",
+        "loaf", "pack", "tin", "can", "jar", "bottle", "bunch", "tbsp", "tablespoon", "tsp",
+        "teaspoon", "cup", "cups", "oz", "lb", "pinch", "slice", "slices"
+    )
+}
+MAX_UNIT_CODES = 200
+
+def _unit_code(unit_lower: str) -> int:
+    """Class of a shopping-list unit - one dict lookup for any unit seen before"""
+    code = UNIT_CODES.get(unit_lower)
+    if code is None:
+        code = _classify_unit(unit_lower)
+        if len(UNIT_CODES) < MAX_UNIT_CODES:
+            UNIT_CODES[unit_lower] = code
+    return code
+
+def _pack_code(pack_unit: str) -> tuple:
+    """Return (pack flags, pack size) for a price table unit like "250g" - size is 0 if not given"""
+    flags = 0
+    if 'kg' in pack_unit:
+        flags |= PACK_KG
+    if 'g' in pack_unit:
+        flags |= PACK_G
+    if 'liter' in pack_unit or 'litre' in pack_unit or pack_unit == 'l':
+        flags |= PACK_LITRE
+    if 'ml' in pack_unit:
+        flags |= PACK_ML
+    if 'pack' in pack_unit:
+        flags |= PACK_MULTI
+    digits = ''.join(filter(str.isdigit, pack_unit))
+    return flags, float(digits) if digits else 0.0
+
+@lru_cache(maxsize=None)
+def _pack_codes() -> list:
+    """_pack_code for every price table row, parsed once"""
+    return [_pack_code(unit.lower()) for unit in _uk_prices()["unit"].tolist()]
+
+def _compute_multiplier(unit_code: int, pack_flags: int, pack_size: float, quantity: float) -> float:
+    """How many packs a quantity needs, capped to 0.1-20x the pack price"""
+    if unit_code == UNIT_G:
+        if pack_flags & PACK_KG:
+            multiplier = quantity / 1000
+        elif pack_flags & PACK_G:
+            multiplier = quantity / (pack_size or 250)
+        else:
+            multiplier = quantity / 250  # Assume 250g typical pack
+    elif unit_code == UNIT_KG:
+        if pack_flags & PACK_KG:
+            multiplier = quantity
+        elif pack_flags & PACK_G:
+            multiplier = (quantity * 1000) / (pack_size or 250)
+        else:
+            multiplier = quantity * 4
+    elif unit_code == UNIT_ML:
+        if pack_flags & PACK_LITRE:
+            multiplier = quantity / 1000
+        elif pack_flags & PACK_ML:
+            multiplier = quantity / (pack_size or 500)
+        else:
+            multiplier = quantity / 500
+    elif unit_code == UNIT_L:
+        if pack_flags & PACK_ML:
+            multiplier = (quantity * 1000) / (pack_size or 500)
+        else:
+            multiplier = quantity
+    else:
+        # Discrete items or no unit specified
+        if pack_flags & PACK_MULTI:
+            multiplier = quantity / (pack_size or 6)
+        elif pack_flags & PACK_G:
+            # Item is sold by weight, estimate pieces
+            multiplier = max(0.5, quantity / 2)
+        else:
+            multiplier = quantity
     
-    # First try to find a matching price entry
-    matched_data = None
-    for key, data in UK_PRICE_DATA.items():
-        if key in name_lower or name_lower in key:
-            matched_data = data
-            break
+    return max(0.1, min(multiplier, 20))
+
+def _to_pence(pounds: np.ndarray) -> np.ndarray:
+    """Whole pence for each amount, rounded exactly like round(amount, 2)
+    np.round and np.rint work on the scaled float, so a halfway case such as 0.075 (stored just
+    below 7.5p) would come out a penny higher than round() gives.
+    """
+    pounds = np.asarray(pounds, dtype=np.float64)
+    pence = (round(round(amount, 2) * 100) for amount in pounds.ravel().tolist())
+    return np.fromiter(pence, dtype=np.int64, count=pounds.size).reshape(pounds.shape)
+
+def default_item_prices(quantities: np.ndarray, unit_codes: np.ndarray) -> np.ndarray:
+    """Default estimates for unknown items, for a whole batch at once
+    REALISTIC UK supermarket pricing - most items are in the £1-5 range.
+    """
+    q = quantities
+    conds = [unit_codes == UNIT_G, unit_codes == UNIT_KG, unit_codes == UNIT_ML, unit_codes == UNIT_L, q < 1, q <= 6]
+    # Price per 100g is typically £0.50-£1.50 for most items
+    prices = np.select(conds, [(q / 100) * 0.80, q * 5.00, (q / 100) * 0.40, q * 2.00, q * 2.00, q * 0.80], default=q * 0.50)
+    floors = np.select(conds, [0.50, 1.00, 0.30, 1.00, 0.30, 0.50], default=-np.inf)
+    caps = np.select(conds, [8.00, 15.00, 6.00, 8.00, np.inf, 4.00], default=6.00)
+    return _to_pence(np.clip(prices, floors, caps)) / 100
+
+def _item_key(item_name: str, quantity: float, unit: str) -> tuple:
+    """Normalised (name, quantity, unit) used to match and cache an item"""
+    unit_lower = unit.lower().strip() if unit else ""
+    return item_name.lower(), round(quantity, 3), unit_lower
+
+@lru_cache(maxsize=4096)
+def _match_item_price(name_lower: str, quantity: float, unit_lower: str) -> tuple:
+    """Match a shopping item to the price table
+    Returns (row index, quantity multiplier) for known items, or (None, None) otherwise.
+    """
+    # An exact key (or its singular) is the common case, and must beat shorter keys
+    # it contains - e.g. "coconut milk" shouldn't be priced as "milk", nor "chopped tomatoes" as "tomato"
+    automaton = _price_matcher()[0]
+    row_idx = automaton.get(name_lower, None)
+    if row_idx is None and name_lower.endswith('s'):
+        singulars = [name_lower[:-1]]
+        if name_lower.endswith('es'):
+            singulars.append(name_lower[:-2])
+        if name_lower.endswith('ies'):
+            singulars.append(name_lower[:-3] + 'y')
+        row_idx = next((automaton.get(s) for s in singulars if automaton.exists(s)), None)
+    
+    # Otherwise look for price entries within (or containing) the name
+    matches = {row_idx} if row_idx is not None else _price_key_matches(name_lower)
     
     # If no exact match, try partial word matching
-    if not matched_data:
-        name_words = name_lower.split()
-        for key, data in UK_PRICE_DATA.items():
-            if any(key in word or word in key for word in name_words if len(word) > 3):
-                matched_data = data
-                break
+    if not matches:
+        for word in name_lower.split():
+            if len(word) > 3:
+                matches |= _price_key_matches(word)
     
-    if matched_data:
-        base_price = matched_data["price"]
-        pack_unit = matched_data.get("unit", "each").lower()
-        
-        # Calculate multiplier based on quantity and unit conversion
-        multiplier = 1.0
-        
-        # Determine if unit is grams (but not kg)
-        is_grams = ('g' in unit_lower and 'kg' not in unit_lower) or unit_lower == 'g' or unit_lower == 'gram' or unit_lower == 'grams'
-        is_kg = 'kg' in unit_lower or 'kilo' in unit_lower
-        is_ml = 'ml' in unit_lower
-        is_liters = ('l' in unit_lower and 'ml' not in unit_lower) or unit_lower in ['l', 'liter', 'litre', 'liters', 'litres']
-        
-        if is_grams:
-            # Quantity is in grams
-            if 'kg' in pack_unit:
-                multiplier = quantity / 1000
-            elif 'g' in pack_unit:
-                pack_size = float(''.join(filter(str.isdigit, pack_unit)) or 250)
-                multiplier = quantity / pack_size
-            else:
-                multiplier = quantity / 250  # Assume 250g typical pack
-        elif is_kg:
-            # Quantity is in kg
-            if 'kg' in pack_unit:
-                multiplier = quantity
-            elif 'g' in pack_unit:
-                pack_size = float(''.join(filter(str.isdigit, pack_unit)) or 250)
-                multiplier = (quantity * 1000) / pack_size
-            else:
-                multiplier = quantity * 4
-        elif is_ml:
-            # Quantity is in ml
-            if 'liter' in pack_unit or 'litre' in pack_unit or pack_unit == 'l':
-                multiplier = quantity / 1000
-            elif 'ml' in pack_unit:
-                pack_size = float(''.join(filter(str.isdigit, pack_unit)) or 500)
-                multiplier = quantity / pack_size
-            else:
-                multiplier = quantity / 500
-        elif is_liters:
-            # Quantity is in liters
-            if 'ml' in pack_unit:
-                pack_size = float(''.join(filter(str.isdigit, pack_unit)) or 500)
-                multiplier = (quantity * 1000) / pack_size
-            else:
-                multiplier = quantity
-        elif any(x in unit_lower for x in ['each', 'piece', 'pcs', 'clove', 'bulb', 'head', 'loaf', '']):
-            # Discrete items or no unit specified
-            if 'pack' in pack_unit:
-                pack_size = float(''.join(filter(str.isdigit, pack_unit)) or 6)
-                multiplier = quantity / pack_size
-            elif 'g' in pack_unit:
-                # Item is sold by weight, estimate pieces
-                multiplier = max(0.5, quantity / 2)
-            else:
-                multiplier = quantity
-        elif unit_lower in ['tbsp', 'tablespoon', 'tsp', 'teaspoon']:
-            # Small measurement - estimate as fraction of a bottle/jar
-            if unit_lower in ['tbsp', 'tablespoon']:
-                multiplier = quantity / 20
-            else:
-                multiplier = quantity / 60
-        else:
-            multiplier = max(0.5, quantity / 2)
+    if matches:
+        # Earliest entry in the price table wins
+        row_idx = min(matches)
+        pack_flags, pack_size = _pack_codes()[row_idx]
+        multiplier = _compute_multiplier(_unit_code(unit_lower), pack_flags, pack_size, quantity)
         
-        # Ensure reasonable multiplier
-        multiplier = max(0.1, min(multiplier, 20))  # Cap at 20x base price
-        
-        estimated_price = round(base_price * multiplier, 2)
-        
-        return {
-            "estimated_price": estimated_price,
-            "prices_by_store": {
-                "tesco": round(matched_data.get("tesco", base_price) * multiplier, 2),
-                "tesco_clubcard": round(matched_data.get("tesco_clubcard", matched_data.get("tesco", base_price)) * multiplier, 2),
-                "sainsburys": round(matched_data.get("sainsburys", base_price) * multiplier, 2),
-                "sainsburys_nectar": round(matched_data.get("sainsburys_nectar", matched_data.get("sainsburys", base_price)) * multiplier, 2),
-                "aldi": round(matched_data.get("aldi", base_price) * multiplier, 2),
-                "lidl": round(matched_data.get("lidl", base_price) * multiplier, 2),
-                "asda": round(matched_data.get("asda", base_price) * multiplier, 2),
-                "morrisons": round(matched_data.get("morrisons", base_price) * multiplier, 2),
-                "morrisons_more": round(matched_data.get("morrisons_more", matched_data.get("morrisons", base_price)) * multiplier, 2),
-            },
-            "matched": True
+        return row_idx, multiplier
+    
+    return None, None
+
+def _scale_pence(pence: np.ndarray, factors) -> np.ndarray:
+    """Scale pence prices by quantity factors, rounded back to whole pence
+    The scaling is done in pounds so each product is the same float round(price * factor, 2) saw.
+    """
+    return _to_pence(pence / 100 * factors)
+
+def _estimate_all(items_to_estimate: List[dict]) -> dict:
+    """Price a list of shopping items and pick the cheapest store (CPU-bound, no I/O)"""
+    # Match every item first, then price the whole list in one pass over the table
+    keys = [
+        _item_key(item['name'], parse_quantity(item.get('quantity', '1')), item.get('unit', ''))
+        for item in items_to_estimate
+    ]
+    matches = [_match_item_price(*key) for key in keys]
+    price_pence, base_pence = _price_table()
+    default_row = len(base_pence) - 1
+    row_idxs = np.array([default_row if row_idx is None else row_idx for row_idx, _ in matches])
+    matched = row_idxs != default_row
+    factors = np.array([factor if factor is not None else 0.0 for _, factor in matches], dtype=np.float64)
+    
+    # Unknown items are priced off the default row, scaled by their default estimate
+    unmatched = np.flatnonzero(~matched)
+    if unmatched.size:
+        factors[unmatched] = default_item_prices(
+            np.array([keys[i][1] for i in unmatched], dtype=np.float64),
+            np.array([_unit_code(keys[i][2]) for i in unmatched])
+        )
+    
+    # Each item is rounded to whole pence, so the totals below are exact integer sums
+    item_store_pence = _scale_pence(price_pence[row_idxs], factors[:, None])
+    item_prices = _scale_pence(base_pence[row_idxs], factors) / 100
+    
+    item_estimates = [
+        {
+            "name": item['name'],
+            "quantity": item.get('quantity', '1'),
+            "unit": item.get('unit', ''),
+            "estimated_price": price,
+            "price_matched": is_matched
         }
+        for item, price, is_matched in zip(items_to_estimate, item_prices.tolist(), matched.tolist())
+    ]
     
-    # Default estimate for unknown items - REALISTIC UK supermarket pricing
-    # Most items are £1-5 range
-    is_grams = ('g' in unit_lower and 'kg' not in unit_lower) or unit_lower in ['g', 'gram', 'grams']
-    is_kg = 'kg' in unit_lower or 'kilo' in unit_lower
-    is_ml = 'ml' in unit_lower
-    is_liters = ('l' in unit_lower and 'ml' not in unit_lower) or unit_lower in ['l', 'liter', 'litre']
-    
-    if is_grams:
-        # Price per 100g is typically £0.50-£1.50 for most items
-        default_price = max(0.50, min((quantity / 100) * 0.80, 8.00))
-    elif is_kg:
-        default_price = max(1.00, min(quantity * 5.00, 15.00))
-    elif is_ml:
-        default_price = max(0.30, min((quantity / 100) * 0.40, 6.00))
-    elif is_liters:
-        default_price = max(1.00, min(quantity * 2.00, 8.00))
-    elif quantity < 1:
-        default_price = max(0.30, quantity * 2.00)
-    elif quantity <= 6:
-        default_price = max(0.50, min(quantity * 0.80, 4.00))
-    else:
-        default_price = min(quantity * 0.50, 6.00)
+    totals_pence = item_store_pence.sum(axis=0)
+    totals_vec = totals_pence / 100
+    store_totals = dict(zip(STORE_COLS, totals_vec.tolist()))
+    
+    # Separate standard and loyalty card prices
+    standard_stores = {k: store_totals[k] for k in STANDARD_STORES}
+    loyalty_stores = {k: store_totals[k] for k in LOYALTY_STORES}
     
-    default_price = round(default_price, 2)
+    # Find cheapest including loyalty cards (standard stores win ties)
+    cheapest_i = CHEAPEST_ORDER_IDX[int(totals_pence[CHEAPEST_ORDER_IDX].argmin())]
+    most_expensive_i = STANDARD_IDX[int(totals_pence[STANDARD_IDX].argmax())]
+    cheapest = (STORE_COLS[cheapest_i], store_totals[STORE_COLS[cheapest_i]])
+    savings = int(totals_pence[most_expensive_i] - totals_pence[cheapest_i]) / 100
+    cheapest_name = STORE_DISPLAY_NAMES[cheapest[0]]
     
     return {
-        "estimated_price": default_price,
-        "prices_by_store": {
-            "tesco": default_price,
-            "tesco_clubcard": round(default_price * 0.85, 2),
-            "sainsburys": round(default_price * 1.1, 2),
-            "sainsburys_nectar": round(default_price * 0.95, 2),
-            "aldi": round(default_price * 0.75, 2),
-            "lidl": round(default_price * 0.75, 2),
-            "asda": round(default_price * 0.9, 2),
-            "morrisons": round(default_price * 0.95, 2),
-            "morrisons_more": round(default_price * 0.85, 2),
+        "items": item_estimates,
+        "totals": standard_stores,
+        "loyalty_totals": loyalty_stores,
+        "cheapest_store": {
+            "name": cheapest_name,
+            "key": cheapest[0],
+            "total": cheapest[1],
+            "has_loyalty": "_" in cheapest[0],
+            "savings_vs_most_expensive": savings
         },
-        "matched": False
+        "average_estimate": round(float(totals_vec[STANDARD_IDX].mean()), 2),
+        "message": f"Shop at {cheapest_name} to save £{savings:.2f}"
     }
 
 @api_router.get("/shopping-list/estimate-costs")
@@ -5756,10 +6090,14 @@ async def estimate_shopping_costs(request: Request):
     """Estimate costs for the shopping list and recommend cheapest store"""
     user_id = await get_user_id_or_none(request)
     
-    query = {"user_id": user_id} if user_id else {"user_id": None}
-    shopping_list = await db.shopping_lists.find_one(query, {"_id": 0})
+    items = _SHOPPING_LIST_CACHE.get(user_id)
+    if items is None:
+        query = {"user_id": user_id} if user_id else {"user_id": None}
+        shopping_list = await db.shopping_lists.find_one(query, {"_id": 0, "items": 1})
+        items = (shopping_list or {}).get('items') or []
+        _SHOPPING_LIST_CACHE[user_id] = items
     
-    if not shopping_list or not shopping_list.get('items'):
+    if not items:
         return {
             "items": [],
             "totals": {},
@@ -5768,7 +6106,7 @@ async def estimate_shopping_costs(request: Request):
         }
     
     # Only estimate for unchecked items
-    items_to_estimate = [item for item in shopping_list['items'] if not item.get('checked', False)]
+    items_to_estimate = [item for item in items if not item.get('checked', False)]
     
     if not items_to_estimate:
         return {
@@ -5778,81 +6116,25 @@ async def estimate_shopping_costs(request: Request):
             "message": "All items checked off"
         }
     
-    # Calculate estimates
-    store_totals = {
-        "tesco": 0, "tesco_clubcard": 0,
-        "sainsburys": 0, "sainsburys_nectar": 0,
-        "aldi": 0, "lidl": 0, "asda": 0, 
-        "morrisons": 0, "morrisons_more": 0
-    }
-    
-    item_estimates = []
-    for item in items_to_estimate:
-        qty = parse_quantity(item.get('quantity', '1'))
-        unit = item.get('unit', '')
-        estimate = estimate_item_price(item['name'], qty, unit)
-        
-        item_estimates.append({
-            "name": item['name'],
-            "quantity": item.get('quantity', '1'),
-            "unit": item.get('unit', ''),
-            "estimated_price": estimate['estimated_price'],
-            "price_matched": estimate['matched']
-        })
-        
-        for store, price in estimate['prices_by_store'].items():
-            store_totals[store] += price
-    
-    # Round totals
-    store_totals = {store: round(total, 2) for store, total in store_totals.items()}
-    
-    # Separate standard and loyalty card prices
-    standard_stores = {k: v for k, v in store_totals.items() if k in ["tesco", "sainsburys", "aldi", "lidl", "asda", "morrisons"]}
-    loyalty_stores = {
-        "tesco_clubcard": store_totals.get("tesco_clubcard", 0),
-        "sainsburys_nectar": store_totals.get("sainsburys_nectar", 0),
-        "morrisons_more": store_totals.get("morrisons_more", 0),
-    }
-    
-    # Find cheapest including loyalty cards
-    all_options = {**standard_stores, **loyalty_stores}
-    cheapest = min(all_options.items(), key=lambda x: x[1])
-    most_expensive = max(standard_stores.items(), key=lambda x: x[1])
-    savings = round(most_expensive[1] - cheapest[1], 2)
-    
-    # Format display name
-    display_names = {
-        "tesco": "Tesco", "tesco_clubcard": "Tesco (Clubcard)",
-        "sainsburys": "Sainsbury's", "sainsburys_nectar": "Sainsbury's (Nectar)",
-        "aldi": "Aldi", "lidl": "Lidl", "asda": "Asda",
-        "morrisons": "Morrisons", "morrisons_more": "Morrisons (More Card)"
-    }
-    
-    return {
-        "items": item_estimates,
-        "totals": standard_stores,
-        "loyalty_totals": loyalty_stores,
-        "cheapest_store": {
-            "name": display_names.get(cheapest[0], cheapest[0].title()),
-            "key": cheapest[0],
-            "total": cheapest[1],
-            "has_loyalty": "_" in cheapest[0],
-            "savings_vs_most_expensive": savings
-        },
-        "average_estimate": round(sum(standard_stores.values()) / len(standard_stores), 2),
-        "message": f"Shop at {display_names.get(cheapest[0], cheapest[0].title())} to save £{savings:.2f}"
-    }
+    # Matching and pricing are CPU-bound - keep them off the event loop.
+    # The result is plain JSON types already, so hand it to orjson directly and skip jsonable_encoder.
+    return ORJSONResponse(await asyncio.to_thread(_estimate_all, items_to_estimate))
+
+DEFAULT_CORS_ORIGINS = (
+    "http://localhost:3000",
+    "http://localhost:8001",
+    "https://localhost:3000",
+)
+
+@lru_cache(maxsize=None)
+def parse_cors_origins(cors_origins_str: str) -> tuple:
+    """Comma-separated CORS_ORIGINS value -> tuple of origins (localhost defaults if unset or '*')"""
+    if cors_origins_str and cors_origins_str != '*':
+        return tuple(origin.strip() for origin in cors_origins_str.split(',') if origin.strip())
+    return DEFAULT_CORS_ORIGINS
 
 # Get CORS origins from environment
-cors_origins_str = os.environ.get('CORS_ORIGINS', '')
-if cors_origins_str and cors_origins_str != '*':
-    cors_origins = [origin.strip() for origin in cors_origins_str.split(',') if origin.strip()]
-else:
-    cors_origins = [
-        "http://localhost:3000",
-        "http://localhost:8001",
-        "https://localhost:3000",
-    ]
+cors_origins = parse_cors_origins(os.environ.get('CORS_ORIGINS', ''))
 
 app.add_middleware(
     CORSMiddleware,
@@ -5863,12 +6145,90 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Recipe and cocktail lists are large, repetitive JSON - compress anything over 1KB
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
+@app.on_event("startup")
+async def create_indexes():
+    """Ensure the indexes behind per-request lookups exist"""
+    indexes = [
+        (db.recipes, [("user_id", 1), ("id", 1)], {"unique": True}),
+        # Cocktail list filters, newest first
+        (db.recipes, [("recipe_type", 1), ("is_alcoholic", 1), ("user_id", 1), ("created_at", -1)], {}),
+        (db.safe_recipes, [("user_id", 1), ("original_recipe_id", 1)], {"unique": True}),
+        (db.safe_recipes, [("id", 1)], {}),
+        (db.import_tokens, [("token", 1)], {"unique": True}),
+        # Mongo's TTL monitor deletes tokens once purge_at (a grace period after expiry) passes
+        (db.import_tokens, [("purge_at", 1)], {"expireAfterSeconds": 0}),
+        # Prefix also serves plain pantry lookups by user_id
+        (db.pantry, [("user_id", 1), ("items.expiry_epoch_days", 1)], {}),
+        (db.rewrite_cache, [("source_hash", 1), ("prompt_version", 1)], {"unique": True}),
+        # Expire cached AI rewrites so stale prompt versions don't pile up
+        (db.rewrite_cache, [("cached_at", 1)], {"expireAfterSeconds": REWRITE_CACHE_TTL_DAYS * 24 * 3600}),
+    ]
+    try:
+        # Superseded by the purge_at TTL - it deleted tokens the moment they expired, turning 410s into 404s
+        await db.import_tokens.drop_index("expires_at_1")
+    except Exception:
+        pass  # never created, or already dropped
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception as e:
+            # Don't block startup on e.g. legacy duplicates - the query still works without it
+            logger.warning(f"Could not create index {keys} on {collection.name}: {e}")
+
+@app.on_event("startup")
+async def warm_db_pool():
+    """Open pooled connections up front so the first requests don't pay for the handshakes"""
+    if db is None:
+        return
+    try:
+        await db.command("ping")
+        # Concurrent commands each check out (and so open) their own connection
+        await asyncio.gather(*(db.command("ping") for _ in range(10)))
+    except Exception as e:
+        logger.warning(f"MongoDB pool warm-up failed: {e}")
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
 
 # ============== RECIPE CONVERSION (VEGAN/VEGETARIAN) ==============
 
+# Parsed AI conversions keyed by a digest of the exact prompt input, so converting the
+# same ingredients again (e.g. a retry from the UI) skips the model call
+_DIET_CONVERSION_CACHE = TTLCache(maxsize=1024, ttl=24 * 3600)
+# Tags each conversion replaces, then the tags it adds
+VEGAN_REPLACED_CATEGORIES = frozenset({'can-be-vegan', 'vegan', 'vegetarian', 'pescatarian'})
+VEGAN_ADDED_CATEGORIES = ('vegan', 'vegetarian')
+VEGETARIAN_REPLACED_CATEGORIES = frozenset({'can-be-vegan', 'vegetarian', 'pescatarian'})
+VEGETARIAN_ADDED_CATEGORIES = ('vegetarian', 'can-be-vegan')
+# The conversion prompt and update only need these - skips decoding stored images
+DIET_CONVERSION_PROJECTION = {"_id": 0, "name": 1, "ingredients": 1, "categories": 1, "description": 1}
+
+async def convert_recipe_diet(system_prompt: str, user_content: str) -> dict:
+    """Ask the AI for a diet conversion, reusing a cached answer for identical input"""
+    cache_key = hashlib.blake2b(user_content.encode('utf-8'), digest_size=16).digest()
+    data = _DIET_CONVERSION_CACHE.get(cache_key)
+    if data is not None:
+        return data
+    
+    response = await openai_client.chat.completions.create(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content}
+        ],
+        max_tokens=1500
+    )
+    
+    data = extract_json_object(response.choices[0].message.content.strip())
+    if data is None:
+        raise HTTPException(status_code=500, detail="Failed to parse AI response")
+    _DIET_CONVERSION_CACHE[cache_key] = data
+    return data
+
 @api_router.post("/recipes/{recipe_id}/make-vegan")
 async def make_recipe_vegan(recipe_id: str, request: Request):
     """Convert a recipe to vegan by substituting all animal products with plant-based alternatives"""
@@ -5879,7 +6239,7 @@ async def make_recipe_vegan(recipe_id: str, request: Request):
     if user_id:
         query["user_id"] = user_id
     
-    recipe = await db.recipes.find_one(query, {"_id": 0})
+    recipe = await db.recipes.find_one(query, DIET_CONVERSION_PROJECTION)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
@@ -5922,41 +6282,17 @@ Return ONLY valid JSON:
     "tips": "Optional cooking tip for the vegan version"
 }"""
 
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Convert this recipe to VEGAN:\n\nRecipe: {recipe.get('name', 'Unknown')}\n\nIngredients:\n{ingredients_text}"}
-            ],
-            max_tokens=1500
+        data = await convert_recipe_diet(
+            system_prompt,
+            f"Convert this recipe to VEGAN:\n\nRecipe: {recipe.get('name', 'Unknown')}\n\nIngredients:\n{ingredients_text}"
         )
         
-        result = response.choices[0].message.content.strip()
-        
-        # Parse JSON
-        if "```json" in result:
-            result = result.split("```json")[1].split("```")[0]
-        elif "```" in result:
-            result = result.split("```")[1].split("```")[0]
-        
-        import json
-        try:
-            data = json.loads(result.strip())
-        except json.JSONDecodeError:
-            start = result.find("{")
-            end = result.rfind("}") + 1
-            if start >= 0 and end > start:
-                data = json.loads(result[start:end])
-            else:
-                raise HTTPException(status_code=500, detail="Failed to parse AI response")
-        
         new_ingredients = data.get("ingredients", [])
         substitutions = data.get("substitutions_made", [])
         tips = data.get("tips", "")
         
         # Update recipe in database
-        new_categories = list(set(recipe.get('categories', [])) - {'can-be-vegan', 'vegetarian', 'pescatarian'})
-        new_categories.extend(['vegan', 'vegetarian'])
+        new_categories = [*(set(recipe.get('categories') or ()) - VEGAN_REPLACED_CATEGORIES), *VEGAN_ADDED_CATEGORIES]
         
         update_data = {
             "ingredients": new_ingredients,
@@ -5964,10 +6300,10 @@ Return ONLY valid JSON:
             "description": f"🌱 Veganized! {tips}" if tips else recipe.get('description', '')
         }
         
-        await db.recipes.update_one(query, {"$set": update_data})
-        
-        # Fetch and return the updated recipe
-        updated_recipe = await db.recipes.find_one(query, {"_id": 0})
+        # Update and return the updated recipe in one round trip
+        updated_recipe = await db.recipes.find_one_and_update(
+            query, {"$set": update_data}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
         return updated_recipe
         
     except Exception as e:
@@ -5985,7 +6321,7 @@ async def make_recipe_vegetarian(recipe_id: str, request: Request):
     if user_id:
         query["user_id"] = user_id
     
-    recipe = await db.recipes.find_one(query, {"_id": 0})
+    recipe = await db.recipes.find_one(query, DIET_CONVERSION_PROJECTION)
     if not recipe:
         raise HTTPException(status_code=404, detail="Recipe not found")
     
@@ -6022,44 +6358,17 @@ Return ONLY valid JSON:
     "tips": "Optional cooking tip for the vegetarian version"
 }"""
 
-        response = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Convert this recipe to VEGETARIAN:\n\nRecipe: {recipe.get('name', 'Unknown')}\n\nIngredients:\n{ingredients_text}"}
-            ],
-            max_tokens=1500
+        data = await convert_recipe_diet(
+            system_prompt,
+            f"Convert this recipe to VEGETARIAN:\n\nRecipe: {recipe.get('name', 'Unknown')}\n\nIngredients:\n{ingredients_text}"
         )
         
-        result = response.choices[0].message.content.strip()
-        
-        # Parse JSON
-        if "```json" in result:
-            result = result.split("```json")[1].split("```")[0]
-        elif "```" in result:
-            result = result.split("```")[1].split("```")[0]
-        
-        import json
-        try:
-            data = json.loads(result.strip())
-        except json.JSONDecodeError:
-            start = result.find("{")
-            end = result.rfind("}") + 1
-            if start >= 0 and end > start:
-                data = json.loads(result[start:end])
-            else:
-                raise HTTPException(status_code=500, detail="Failed to parse AI response")
-        
         new_ingredients = data.get("ingredients", [])
         substitutions = data.get("substitutions_made", [])
         tips = data.get("tips", "")
         
         # Update recipe in database
-        new_categories = list(set(recipe.get('categories', [])) - {'can-be-vegan', 'pescatarian'})
-        if 'vegetarian' not in new_categories:
-            new_categories.append('vegetarian')
-        if 'can-be-vegan' not in new_categories:
-            new_categories.append('can-be-vegan')
+        new_categories = [*(set(recipe.get('categories') or ()) - VEGETARIAN_REPLACED_CATEGORIES), *VEGETARIAN_ADDED_CATEGORIES]
         
         update_data = {
             "ingredients": new_ingredients,
@@ -6067,10 +6376,10 @@ Return ONLY valid JSON:
             "description": f"🥬 Vegetarian version! {tips}" if tips else recipe.get('description', '')
         }
         
-        await db.recipes.update_one(query, {"$set": update_data})
-        
-        # Fetch and return the updated recipe
-        updated_recipe = await db.recipes.find_one(query, {"_id": 0})
+        # Update and return the updated recipe in one round trip
+        updated_recipe = await db.recipes.find_one_and_update(
+            query, {"$set": update_data}, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
         return updated_recipe
         
     except Exception as e:
@@ -6081,29 +6390,53 @@ Return ONLY valid JSON:
 # Include the router in the main app (must be before static file catch-all)
 app.include_router(api_router)
 
-# Serve static frontend files in production (MUST be after api_router to not catch /api routes)
+# Serve static frontend files in production (MUST be after api_router to not catch /api routes).
+# A build without index.html (e.g. a partial copy) is skipped so the API still starts.
 static_dir = ROOT_DIR / "static"
-if static_dir.exists():
+if static_dir.exists() and (static_dir / "index.html").is_file():
     from fastapi.staticfiles import StaticFiles
     from fastapi.responses import FileResponse
     
+    # Build output names hashed assets like main.3f2a9c1d.js - their content never changes
+    HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.")
+    
+    class CachedStaticFiles(StaticFiles):
+        """StaticFiles that lets browsers keep content-hashed assets for a week"""
+        def file_response(self, full_path, stat_result, scope, status_code=200):
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            if HASHED_ASSET_RE.search(os.path.basename(full_path)):
+                response.headers["Cache-Control"] = "public, max-age=604800, immutable"
+            return response
+    
+    # The build is fixed for the life of the process, so index it (and stat it) once rather than per request
+    STATIC_FILE_INDEX = {
+        file_path.relative_to(static_dir).as_posix(): (file_path, file_path.stat())
+        for file_path in static_dir.rglob("*") if file_path.is_file()
+    }
+    INDEX_HTML = STATIC_FILE_INDEX["index.html"]
+    
+    def spa_file_response(request: Request, static_file: tuple) -> Response:
+        """Serve an indexed SPA file with a stat-based ETag, answering revalidations with 304"""
+        file_path, stat_result = static_file
+        response = FileResponse(file_path, stat_result=stat_result, headers={"Cache-Control": "no-cache"})
+        etag = response.headers["etag"]
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        return response
+    
     # Mount static files for assets (js, css, images)
-    app.mount("/static", StaticFiles(directory=static_dir / "static"), name="static_assets")
+    app.mount("/static", CachedStaticFiles(directory=static_dir / "static"), name="static_assets")
     
     @app.get("/")
-    async def serve_root():
-        return FileResponse(static_dir / "index.html")
+    async def serve_root(request: Request):
+        return spa_file_response(request, INDEX_HTML)
     
     # Catch-all for SPA routing - exclude /api routes (handled by api_router above)
     @app.get("/{path:path}")
-    async def serve_spa(path: str):
-        # API routes are already handled by api_router, this shouldn't be reached
-        if path.startswith("api"):
+    async def serve_spa(path: str, request: Request):
+        # API routes are already handled by api_router, so this is an unknown /api path
+        if path[:3] == "api" and (len(path) == 3 or path[3] == "/"):
             raise HTTPException(status_code=404, detail="Not found")
         
-        file_path = static_dir / path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        # For SPA routing, return index.html
-        return FileResponse(static_dir / "index.html")
-
+        # Anything that isn't a built file is an SPA route - return index.html
+        return spa_file_response(request, STATIC_FILE_INDEX.get(path, INDEX_HTML))
@@ -0,0 +1,161 @@
+"""
+Shared fixtures for the backend API tests.
+Modules that need a different identity (e.g. a bearer token) define their own api_client,
+which takes precedence over the one here.
+"""
+import base64
+import os
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import orjson
+import pytest
+from pymongo import MongoClient
+
+BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+SESSION_TOKEN = "test_session_1770742873843"
+
+# Small test image (1x1 pixel PNG) for the "upload my own photo" recipe tests
+TEST_PNG_DATA_URL = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+TEST_PNG_BYTES = base64.b64decode(TEST_PNG_DATA_URL.split(",", 1)[1], validate=True)
+
+# Unique per run and per xdist worker, so parallel runs never collide on seeded user ids, sessions or tokens
+RUN_ID = f"{os.environ.get('PYTEST_XDIST_WORKER', 'main')}-{uuid.uuid4().hex[:8]}"
+
+
+def decode_data_url(data_url: str) -> bytes:
+    """Strictly decode the payload of a base64 data URL (raises binascii.Error on bad input)"""
+    return base64.b64decode(data_url.split(",", 1)[1], validate=True)
+
+
+def json_body(response):
+    """Decode a response body with orjson - much faster than stdlib json on the large recipe lists"""
+    return orjson.loads(response.content)
+
+
+def http_client(base_url, headers=None, cookies=None):
+    """The suite's shared HTTP/2 client; modules differ only in the identity they send.
+    Connect fails fast (the health probe has already proven the host is up); reads keep room for AI calls."""
+    return httpx.Client(
+        base_url=base_url,
+        http2=True,
+        headers=headers,
+        cookies=cookies,
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=16),
+        timeout=httpx.Timeout(30.0, connect=2.0),
+        follow_redirects=True,
+    )
+
+
+@pytest.fixture(scope="session")
+def base_url():
+    """Backend root every test client is built on, so call sites pass relative /api paths"""
+    return BASE_URL
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _backend_alive(base_url):
+    """Probe the backend once with a short timeout and stop the whole run if it is unreachable,
+    rather than letting every test wait out its own request timeout"""
+    if not base_url:
+        pytest.exit("REACT_APP_BACKEND_URL is not set - point it at the backend under test", returncode=2)
+    try:
+        httpx.get(f"{base_url}/health", timeout=2.0).raise_for_status()
+    except httpx.HTTPError as exc:
+        pytest.exit(f"Backend unreachable at {base_url!r}: {exc}", returncode=2)
+
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client with auth - one multiplexed connection for the whole run"""
+    with http_client(
+        base_url,
+        headers={"Content-Type": "application/json"},
+        cookies={"session_token": SESSION_TOKEN},
+    ) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def week_start_str():
+    """Monday of the current week, fixed for the session so a run crossing midnight stays consistent"""
+    today = date.today()
+    return (today - timedelta(days=today.weekday())).isoformat()
+
+
+@pytest.fixture(scope="session")
+def created_recipes(api_client):
+    """Ids of recipes created by tests - removed with one bulk delete when the session ends"""
+    ids = []
+    yield ids
+    if ids:
+        api_client.post("/api/recipes/bulk-delete", json={"ids": ids})
+
+
+@pytest.fixture(scope="session")
+def grouped_recipes(api_client):
+    """GET /api/recipes/grouped once per session - the read-only grouping checks share it"""
+    response = api_client.get("/api/recipes/grouped")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    return json_body(response)
+
+
+@pytest.fixture(scope="session")
+def meal_suggestions(api_client):
+    """GET /api/suggestions/meals once per session - the read-only suggestion checks share it"""
+    response = api_client.get("/api/suggestions/meals")
+    assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+    return json_body(response)
+
+
+@pytest.fixture(scope="session")
+def mongo_db():
+    """The backend's database, for seeding users and tokens in-process"""
+    client = MongoClient(os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    yield client[os.environ.get('DB_NAME', 'test_database')]
+    client.close()
+
+
+@pytest.fixture(scope="session")
+def seeded_users(mongo_db):
+    """Both share-test users and their sessions, written with one insert_many per collection"""
+    now = datetime.now(timezone.utc)
+    users = {}
+    for n in (1, 2):
+        user_id = f'test-share-user{n}-{RUN_ID}'
+        session_token = f'test_share_session{n}_{RUN_ID}'
+        # Headers built once per user; httpx sets Content-Type itself for json= bodies
+        users[n] = {"token": session_token, "user_id": user_id, "headers": {"Authorization": f"Bearer {session_token}"}}
+    mongo_db.users.insert_many([
+        {
+            "user_id": user["user_id"],
+            "email": f'test.share{n}.{RUN_ID}@example.com',
+            "name": f'Test Share User {n}',
+            "picture": 'https://via.placeholder.com/150',
+            "created_at": now
+        }
+        for n, user in users.items()
+    ])
+    mongo_db.user_sessions.insert_many([
+        {
+            "user_id": user["user_id"],
+            "session_token": user["token"],
+            "expires_at": now + timedelta(days=7),
+            "created_at": now
+        }
+        for user in users.values()
+    ])
+    return users
+
+
+@pytest.fixture(scope="session")
+def test_user1(seeded_users):
+    """First test user"""
+    return seeded_users[1]
+
+
+@pytest.fixture(scope="session")
+def test_user2(seeded_users):
+    """Second test user for import testing"""
+    return seeded_users[2]
@@ -8,6 +8,7 @@ Test suite for Cocktails and Pantry Enhancement Features (Iteration 16)
 import pytest
 import requests
 import os
+from collections import Counter
 from datetime import datetime
 
 BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
@@ -17,39 +18,43 @@ SESSION_TOKEN = "test_session_cocktails_1770824861278"
 USER_ID = "test-user-cocktails-1770824861277"
 
 
+@pytest.fixture(scope="module")
+def client():
+    """One keep-alive session, already authenticated, shared by every test in the module"""
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {SESSION_TOKEN}"})
+    yield session
+    session.close()
+
+
 class TestCocktailsEndpoint:
     """Tests for GET /api/cocktails endpoint"""
     
-    def test_cocktails_endpoint_returns_empty_initially(self):
+    def test_cocktails_endpoint_returns_empty_initially(self, client):
         """GET /api/cocktails should return empty array when no cocktails exist"""
-        response = requests.get(
-            f"{BASE_URL}/api/cocktails",
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
-        )
+        response = client.get(f"{BASE_URL}/api/cocktails")
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         data = response.json()
         assert isinstance(data, list), "Response should be a list"
         # Initially empty for new user
         print(f"✓ GET /api/cocktails returns list with {len(data)} items")
     
-    def test_cocktails_endpoint_accepts_alcoholic_true_param(self):
+    def test_cocktails_endpoint_accepts_alcoholic_true_param(self, client):
         """GET /api/cocktails?alcoholic=true should filter alcoholic cocktails"""
-        response = requests.get(
+        response = client.get(
             f"{BASE_URL}/api/cocktails",
-            params={"alcoholic": "true"},
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            params={"alcoholic": "true"}
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         data = response.json()
         assert isinstance(data, list), "Response should be a list"
         print(f"✓ GET /api/cocktails?alcoholic=true returns {len(data)} items")
     
-    def test_cocktails_endpoint_accepts_alcoholic_false_param(self):
+    def test_cocktails_endpoint_accepts_alcoholic_false_param(self, client):
         """GET /api/cocktails?alcoholic=false should filter non-alcoholic cocktails"""
-        response = requests.get(
+        response = client.get(
             f"{BASE_URL}/api/cocktails",
-            params={"alcoholic": "false"},
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            params={"alcoholic": "false"}
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         data = response.json()
@@ -60,7 +65,7 @@ class TestCocktailsEndpoint:
 class TestCreateCocktailRecipe:
     """Tests for creating cocktail recipes with recipe_type='cocktail'"""
     
-    def test_create_alcoholic_cocktail(self):
+    def test_create_alcoholic_cocktail(self, client):
         """POST /api/recipes should create a cocktail with recipe_type='cocktail' and is_alcoholic=true"""
         cocktail_data = {
             "name": "TEST_Margarita",
@@ -80,10 +85,9 @@ class TestCreateCocktailRecipe:
             "skip_image_generation": True
         }
         
-        response = requests.post(
+        response = client.post(
             f"{BASE_URL}/api/recipes",
-            json=cocktail_data,
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            json=cocktail_data
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
@@ -98,7 +102,7 @@ class TestCreateCocktailRecipe:
         print(f"✓ Created alcoholic cocktail: {data['name']} (id: {data['id']})")
         return data["id"]
     
-    def test_create_non_alcoholic_cocktail(self):
+    def test_create_non_alcoholic_cocktail(self, client):
         """POST /api/recipes should create a cocktail with recipe_type='cocktail' and is_alcoholic=false"""
         cocktail_data = {
             "name": "TEST_Virgin Mojito",
@@ -118,10 +122,9 @@ class TestCreateCocktailRecipe:
             "skip_image_generation": True
         }
         
-        response = requests.post(
+        response = client.post(
             f"{BASE_URL}/api/recipes",
-            json=cocktail_data,
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            json=cocktail_data
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
@@ -136,13 +139,10 @@ class TestCreateCocktailRecipe:
         print(f"✓ Created non-alcoholic cocktail: {data['name']} (id: {data['id']})")
         return data["id"]
     
-    def test_cocktails_filter_returns_created_cocktails(self):
+    def test_cocktails_filter_returns_created_cocktails(self, client):
         """GET /api/cocktails should return the created cocktails"""
         # Get all cocktails
-        response = requests.get(
-            f"{BASE_URL}/api/cocktails",
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
-        )
+        response = client.get(f"{BASE_URL}/api/cocktails")
         assert response.status_code == 200
         data = response.json()
         
@@ -152,12 +152,11 @@ class TestCreateCocktailRecipe:
         assert "TEST_Virgin Mojito" in cocktail_names, f"TEST_Virgin Mojito not found in {cocktail_names}"
         print(f"✓ GET /api/cocktails returns {len(data)} cocktails including our test cocktails")
     
-    def test_cocktails_filter_alcoholic_true(self):
+    def test_cocktails_filter_alcoholic_true(self, client):
         """GET /api/cocktails?alcoholic=true should only return alcoholic cocktails"""
-        response = requests.get(
+        response = client.get(
             f"{BASE_URL}/api/cocktails",
-            params={"alcoholic": "true"},
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            params={"alcoholic": "true"}
         )
         assert response.status_code == 200
         data = response.json()
@@ -167,17 +166,16 @@ class TestCreateCocktailRecipe:
             assert cocktail.get("is_alcoholic") == True, f"Non-alcoholic cocktail found: {cocktail['name']}"
         
         # Should include our alcoholic cocktail
-        cocktail_names = [c["name"] for c in data]
+        cocktail_names = {c["name"] for c in data}
         assert "TEST_Margarita" in cocktail_names, "TEST_Margarita should be in alcoholic filter"
         assert "TEST_Virgin Mojito" not in cocktail_names, "TEST_Virgin Mojito should NOT be in alcoholic filter"
         print(f"✓ GET /api/cocktails?alcoholic=true returns {len(data)} alcoholic cocktails")
     
-    def test_cocktails_filter_alcoholic_false(self):
+    def test_cocktails_filter_alcoholic_false(self, client):
         """GET /api/cocktails?alcoholic=false should only return non-alcoholic cocktails"""
-        response = requests.get(
+        response = client.get(
             f"{BASE_URL}/api/cocktails",
-            params={"alcoholic": "false"},
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            params={"alcoholic": "false"}
         )
         assert response.status_code == 200
         data = response.json()
@@ -187,7 +185,7 @@ class TestCreateCocktailRecipe:
             assert cocktail.get("is_alcoholic") == False, f"Alcoholic cocktail found: {cocktail['name']}"
         
         # Should include our non-alcoholic cocktail
-        cocktail_names = [c["name"] for c in data]
+        cocktail_names = {c["name"] for c in data}
         assert "TEST_Virgin Mojito" in cocktail_names, "TEST_Virgin Mojito should be in non-alcoholic filter"
         assert "TEST_Margarita" not in cocktail_names, "TEST_Margarita should NOT be in non-alcoholic filter"
         print(f"✓ GET /api/cocktails?alcoholic=false returns {len(data)} non-alcoholic cocktails")
@@ -196,7 +194,7 @@ class TestCreateCocktailRecipe:
 class TestAddItemsToShoppingList:
     """Tests for POST /api/shopping-list/add-items endpoint"""
     
-    def test_add_items_to_shopping_list(self):
+    def test_add_items_to_shopping_list(self, client):
         """POST /api/shopping-list/add-items should add multiple items"""
         items_data = {
             "items": [
@@ -206,10 +204,9 @@ class TestAddItemsToShoppingList:
             ]
         }
         
-        response = requests.post(
+        response = client.post(
             f"{BASE_URL}/api/shopping-list/add-items",
-            json=items_data,
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            json=items_data
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
@@ -224,7 +221,7 @@ class TestAddItemsToShoppingList:
         
         print(f"✓ POST /api/shopping-list/add-items added 3 items, total items: {len(data['items'])}")
     
-    def test_add_items_does_not_duplicate(self):
+    def test_add_items_does_not_duplicate(self, client):
         """POST /api/shopping-list/add-items should not add duplicate items"""
         # Try to add the same items again
         items_data = {
@@ -234,32 +231,27 @@ class TestAddItemsToShoppingList:
             ]
         }
         
-        response = requests.post(
+        response = client.post(
             f"{BASE_URL}/api/shopping-list/add-items",
-            json=items_data,
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
+            json=items_data
         )
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
         data = response.json()
         
-        # Count how many times TEST_Milk appears (should be 1)
-        milk_count = sum(1 for item in data["items"] if item["name"] == "TEST_Milk")
-        assert milk_count == 1, f"TEST_Milk should appear only once, found {milk_count} times"
+        # Count item names in one pass - TEST_Milk should appear once
+        name_counts = Counter(item["name"] for item in data["items"])
+        assert name_counts["TEST_Milk"] == 1, f"TEST_Milk should appear only once, found {name_counts['TEST_Milk']} times"
         
         # TEST_New Item should be added
-        item_names = [item["name"] for item in data["items"]]
-        assert "TEST_New Item" in item_names, "TEST_New Item should be added"
+        assert "TEST_New Item" in name_counts, "TEST_New Item should be added"
         
         print(f"✓ POST /api/shopping-list/add-items correctly handles duplicates")
     
-    def test_add_items_sets_recipe_source(self):
+    def test_add_items_sets_recipe_source(self, client):
         """POST /api/shopping-list/add-items should set recipe_source to 'Pantry Low Stock'"""
         # Get current shopping list
-        response = requests.get(
-            f"{BASE_URL}/api/shopping-list",
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
-        )
+        response = client.get(f"{BASE_URL}/api/shopping-list")
         assert response.status_code == 200
         
         data = response.json()
@@ -276,22 +268,15 @@ class TestAddItemsToShoppingList:
 class TestCleanup:
     """Cleanup test data"""
     
-    def test_cleanup_test_recipes(self):
+    def test_cleanup_test_recipes(self, client):
         """Delete test recipes created during tests"""
         # Get all recipes
-        response = requests.get(
-            f"{BASE_URL}/api/recipes",
-            headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
-        )
+        response = client.get(f"{BASE_URL}/api/recipes")
         if response.status_code == 200:
-            recipes = response.json()
-            for recipe in recipes:
-                if recipe["name"].startswith("TEST_"):
-                    delete_response = requests.delete(
-                        f"{BASE_URL}/api/recipes/{recipe['id']}",
-                        headers={"Authorization": f"Bearer {SESSION_TOKEN}"}
-                    )
-                    print(f"  Deleted recipe: {recipe['name']}")
+            test_ids = [recipe["id"] for recipe in response.json() if recipe["name"].startswith("TEST_")]
+            if test_ids:
+                # One bulk delete instead of a round trip per recipe
+                client.post(f"{BASE_URL}/api/recipes/bulk-delete", json={"ids": test_ids})
         
         print("✓ Cleanup completed")
 
